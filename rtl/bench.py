@@ -0,0 +1,113 @@
+import os
+import re
+import json
+import time
+import argparse
+import subprocess
+
+# Performance counter snapshots written by hwregs.sv when the counters are stopped
+PERF_LOG = "rtl_perf.log"
+perf_re = re.compile(r"PERF ok=(\d+) jmp=(\d+) if=(\d+) sb=(\d+) rs=(\d+)")
+COUNTERS = ["ok", "jmp", "if", "sb", "rs"]
+
+# Names for the stall categories in reports
+STALLS = {
+    "jmp": "jump slots",
+    "if":  "ifetch",
+    "sb":  "data",
+    "rs":  "resource",
+}
+
+HISTORY_FILE = "bench_history.jsonl"
+DEFAULT_THRESHOLD = 2.0     # Percent increase in cycles that counts as a regression
+
+def read_perf(workdir="."):
+    """Return the last counter snapshot from a run as {counter: value}, or None if there is none."""
+    path = os.path.join(workdir, PERF_LOG)
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path) as f:
+        for line in f:
+            m = perf_re.search(line)
+            if m:
+                last = m
+    if last is None:
+        return None
+    return {name: int(v) for name, v in zip(COUNTERS, last.groups())}
+
+def metrics(perf):
+    """Derive cycle count, CPI and the stall breakdown (as a fraction of cycles) from counter values."""
+    cycles = sum(perf[c] for c in COUNTERS)
+    result = {"cycles": cycles, "instructions": perf["ok"],
+              "cpi": cycles / perf["ok"] if perf["ok"] else float("inf")}
+    for c in STALLS:
+        result[c] = perf[c] / cycles if cycles else 0.0
+    return result
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(filename=HISTORY_FILE):
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def append_history(results, filename=HISTORY_FILE):
+    entry = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "revision": git_revision(), "results": results}
+    with open(filename, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+def find_regressions(results, history, threshold=DEFAULT_THRESHOLD):
+    """Compare cycle counts with the most recent history entry containing each test.
+
+    Returns a list of (test, old_cycles, new_cycles, percent_change) for tests
+    that got slower by more than threshold percent."""
+    regressions = []
+    for test, m in results.items():
+        for entry in reversed(history):
+            old = entry["results"].get(test)
+            if old:
+                change = 100.0 * (m["cycles"] - old["cycles"]) / old["cycles"] if old["cycles"] else 0.0
+                if change > threshold:
+                    regressions.append((test, old["cycles"], m["cycles"], change))
+                break
+    return regressions
+
+def print_table(results):
+    header = f"{'test':28} {'cycles':>10} {'instrs':>10} {'CPI':>6}"
+    header += "".join(f" {name:>10}" for name in STALLS.values())
+    print(header)
+    for test, m in results.items():
+        line = f"{os.path.basename(test):28} {m['cycles']:10d} {m['instructions']:10d} {m['cpi']:6.3f}"
+        line += "".join(f" {100 * m[c]:9.1f}%" for c in STALLS)
+        print(line)
+
+def report(results, history_file=HISTORY_FILE, threshold=DEFAULT_THRESHOLD, record=True):
+    """Print the benchmark table, flag regressions against history, and append to it.
+
+    Returns the list of regressions (see find_regressions)."""
+    print_table(results)
+    regressions = find_regressions(results, load_history(history_file), threshold)
+    for test, old, new, change in regressions:
+        print(f"REGRESSION {test}: {old} -> {new} cycles ({change:+.1f}%)")
+    if record and results:
+        append_history(results, history_file)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the benchmark history recorded by regress.py --bench.")
+    parser.add_argument("test", nargs="?", help="Only show this test.")
+    parser.add_argument("--history", default=HISTORY_FILE)
+    args = parser.parse_args()
+
+    for entry in load_history(args.history):
+        for test, m in entry["results"].items():
+            if args.test is None or os.path.basename(test) == os.path.basename(args.test):
+                print(f"{entry['time']} {entry['revision'] or '-':>16} {os.path.basename(test):28} "
+                      f"{m['cycles']:10d} CPI {m['cpi']:6.3f}")
@@ -0,0 +1,139 @@
+import os
+import re
+import sys
+import argparse
+
+# Reference model of the blitter microcode CPU (src/blit_cpu.sv).
+#
+# Instructions are 20 bits: [19:15] opcode, [14:10] rd, [9:5] rs1, [4:0] rs2.
+# The model executes the ROM sequentially and logs every register write in
+# the same format as the RTL's blit_cpu_trace.log, so the two can be
+# compared write by write. The command queue is replayed from the values
+# the RTL's LDCMD instructions received.
+
+ROM_FILE = "blit_cpu_rom.hex"
+RTL_TRACE = "blit_cpu_trace.log"
+MODEL_TRACE = "blit_model.log"        # sim_blit.log is the emulator's
+
+OP_ADD, OP_SUB, OP_ADDI, OP_LOADC = 0x0, 0x1, 0x2, 0x3
+OP_BEQZ, OP_BNEZ, OP_BLTZ, OP_BGTZ = 0x4, 0x5, 0x6, 0x7
+OP_JUMP, OP_LDCMD, OP_BLIT, OP_MULT, OP_SET = 0x8, 0x9, 0xA, 0xB, 0xC
+
+MAX_STEPS = 10_000_000
+RESET_VALUE = 0xDEADCAA2        # regfile_ram's initial value for R1..R28; R0 and R29-R31 start at 0
+
+trace_re = re.compile(r"([0-9a-fA-F]+):\s*R\s*(\d+)=([0-9a-fA-F]+)")
+
+def load_rom(filename=ROM_FILE):
+    with open(filename) as f:
+        rom = [int(line.strip(), 16) for line in f if line.strip() and not line.startswith("//")]
+    return rom + [0] * (1024 - len(rom))
+
+def signed(value, bits):
+    value &= (1 << bits) - 1
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+def decode(instr):
+    return (instr >> 15) & 0x1F, (instr >> 10) & 0x1F, (instr >> 5) & 0x1F, instr & 0x1F
+
+def iter_trace(filename):
+    """Yield ((pc, reg), value, line) for each register write in a blit CPU trace."""
+    with open(filename) as f:
+        for line in f:
+            m = trace_re.search(line)
+            if m:
+                yield (int(m.group(1), 16), int(m.group(2))), int(m.group(3), 16), line.rstrip()
+
+def read_rtl_trace(rom, filename=RTL_TRACE):
+    """Return (commands, writes): the command words the RTL's LDCMD instructions
+    received, and the total number of register writes in its trace."""
+    commands = []
+    writes = 0
+    for (pc, _), value, _ in iter_trace(filename):
+        writes += 1
+        if decode(rom[pc])[0] == OP_LDCMD:
+            commands.append(value)
+    return commands, writes
+
+def run(rom, commands, out, max_steps=MAX_STEPS, max_writes=None):
+    """Execute the microcode, writing register writes to the file object out.
+
+    Stops when LDCMD finds the command queue empty, at a jump to itself,
+    after max_steps instructions or after max_writes register writes.
+    Returns the number of instructions executed."""
+    regs = [0] + [RESET_VALUE] * 28 + [0] * 3
+    pc = 0
+    queue = iter(commands)
+    writes = 0
+
+    def write(rd, value, at):
+        nonlocal writes
+        value &= 0xFFFFFFFF
+        if rd != 0:
+            regs[rd] = value
+            out.write(f"{at:03x}: R{rd:2d}={value:08x}\n")
+            writes += 1
+
+    for step in range(max_steps):
+        if max_writes is not None and writes >= max_writes:
+            return step
+        opcode, rd, rs1, rs2 = decode(rom[pc])
+        a, b = signed(regs[rs1], 32), signed(regs[rs2], 32)
+        target = (rd << 5) | rs2
+        next_pc = (pc + 1) & 0x3FF
+
+        if opcode == OP_ADD:
+            write(rd, a + b, pc)
+        elif opcode == OP_SUB:
+            write(rd, a - b, pc)
+        elif opcode == OP_ADDI:
+            write(rd, a + signed(rs2, 5), pc)
+        elif opcode == OP_LOADC:
+            write(rd, signed((rs1 << 5) | rs2, 10), pc)
+        elif opcode == OP_BEQZ:
+            next_pc = target if a == 0 else next_pc
+        elif opcode == OP_BNEZ:
+            next_pc = target if a != 0 else next_pc
+        elif opcode == OP_BLTZ:
+            next_pc = target if a < 0 else next_pc
+        elif opcode == OP_BGTZ:
+            next_pc = target if a > 0 else next_pc
+        elif opcode == OP_JUMP:
+            if target == pc:
+                return step
+            next_pc = target
+        elif opcode == OP_LDCMD:
+            cmd = next(queue, None)
+            if cmd is None:
+                return step
+            write(rd, cmd, pc)
+        elif opcode == OP_MULT:
+            write(rd, a * b, pc)
+        # BLIT and SET have no effect on the register file
+
+        pc = next_pc
+    return max_steps
+
+def generate(workdir="."):
+    """Write the model trace for a simulation directory from its ROM and RTL trace.
+
+    The model stops after as many writes as the RTL made, since the RTL trace
+    ends wherever the simulation was stopped."""
+    rom = load_rom(os.path.join(workdir, ROM_FILE))
+    commands, writes = read_rtl_trace(rom, os.path.join(workdir, RTL_TRACE))
+    with open(os.path.join(workdir, MODEL_TRACE), "w") as out:
+        return run(rom, commands, out, max_writes=writes)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the blitter microcode reference model against an RTL trace.")
+    parser.add_argument("--rom", default=ROM_FILE)
+    parser.add_argument("--rtl-trace", default=RTL_TRACE, help="RTL trace supplying the command queue contents.")
+    parser.add_argument("-o", "--output", default=MODEL_TRACE)
+    args = parser.parse_args()
+
+    rom = load_rom(args.rom)
+    commands, writes = read_rtl_trace(rom, args.rtl_trace)
+    with open(args.output, "w") as out:
+        steps = run(rom, commands, out, max_writes=writes)
+    print(f"Executed {steps} instructions, {len(commands)} commands")
+    sys.exit(0)
@@ -1,28 +1,81 @@
-import subprocess
-import re
-
-# --- Configuration ---
-command = ["iverilog.exe", "-g2012", "-I", ".\\src", "-s", "tb", ".\\src\\*.sv"]
-pattern1 = re.compile(r"^.*constant selects in always.*$")
-pattern2 = re.compile(r"^.*cannot be synthesized in an always_ff process.*$")
-pattern3 = re.compile(r"^.*cannot be synthesized in an always_comb process.*$")
-
-# --- Run the command ---
-try:
-    result = subprocess.run(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,  # capture stderr too; change to subprocess.PIPE if you want to separate them
-        text=True,
-        check=False  # set to True to raise an error on non-zero exit codes
-    )
-
-    # --- Filter and print output ---
-    for line in result.stdout.splitlines():
-        if (not pattern1.search(line)) and (not pattern2.search(line) and (not pattern3.search(line))):
-            print(line)
-
-except FileNotFoundError:
-    print(f"Error: Command not found: {command[0]}")
-except Exception as e:
-    print(f"An error occurred: {e}")
+import os
+import sys
+import glob
+import hashlib
+import subprocess
+import re
+import argparse
+
+# --- Configuration ---
+SRC_DIR = "src"
+OUTPUT = "a.out"
+STAMP_FILE = ".build_hash"       # Hash of the sources a.out was built from
+pattern1 = re.compile(r"^.*constant selects in always.*$")
+pattern2 = re.compile(r"^.*cannot be synthesized in an always_ff process.*$")
+pattern3 = re.compile(r"^.*cannot be synthesized in an always_comb process.*$")
+
+def source_files():
+    """The RTL sources and include files (blit.vh, cpu.vh, ...) that make up the design."""
+    return sorted(glob.glob(os.path.join(SRC_DIR, "*.sv")) + glob.glob(os.path.join(SRC_DIR, "*.vh")))
+
+def build_command():
+    sv_files = [f for f in source_files() if f.endswith(".sv")]
+    return ["iverilog.exe", "-g2012", "-I", SRC_DIR, "-s", "tb", "-o", OUTPUT] + sv_files
+
+def source_hash(command):
+    """Hash of the compiler command line and the contents of every source file."""
+    h = hashlib.sha256(" ".join(command).encode())
+    for path in source_files():
+        h.update(path.encode())
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def up_to_date(digest):
+    if not os.path.exists(OUTPUT) or not os.path.exists(STAMP_FILE):
+        return False
+    with open(STAMP_FILE) as f:
+        return f.read().strip() == digest
+
+def build(force=False):
+    """Compile the RTL into a.out unless it is already up to date.
+
+    Compiler output is filtered and printed as it arrives. Returns the
+    compiler exit status (0 if nothing needed rebuilding)."""
+    command = build_command()
+    digest = source_hash(command)
+    if not force and up_to_date(digest):
+        print(f"{OUTPUT} is up to date")
+        return 0
+
+    # Remove the stamp first so an interrupted build is never treated as current
+    if os.path.exists(STAMP_FILE):
+        os.remove(STAMP_FILE)
+
+    try:
+        proc = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True
+        )
+    except FileNotFoundError:
+        print(f"Error: Command not found: {command[0]}")
+        return 127
+
+    # --- Filter and print output as it is produced ---
+    for line in proc.stdout:
+        if not (pattern1.search(line) or pattern2.search(line) or pattern3.search(line)):
+            print(line, end="", flush=True)
+    proc.wait()
+
+    if proc.returncode == 0:
+        with open(STAMP_FILE, "w") as f:
+            f.write(digest + "\n")
+    return proc.returncode
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the RTL for simulation.")
+    parser.add_argument("-f", "--force", action="store_true", help="Rebuild even if a.out is up to date.")
+    args = parser.parse_args()
+    sys.exit(build(args.force))
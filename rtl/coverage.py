@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+import regress
+
+# Emulator trace written by f32sim -t: "%08x: %-40s" pc and disassembly, then side effects
+TRACE_FILE = "sim_traace.log"
+DIS_START = 10
+DIS_END = 50
+CHUNK_LINES = 1 << 18
+
+# Instruction formats (binutils/isa.txt) and the sub-ops each one can take
+ALU_OPS = ["and", "or", "xor", "add", "sub", "clt", "cltu", "lsl", "lsr", "asr"]
+ISA = {
+    "ALU":  ALU_OPS,
+    "ALUI": ALU_OPS,
+    "LD":   ["ldb", "ldh", "ldw"],
+    "ST":   ["stb", "sth", "stw"],
+    "Bcc":  ["beq", "bne", "blt", "bge", "bltu", "bgeu"],
+    "JMP":  ["jmp", "jsr"],
+    "JMPR": ["jmp", "ret"],
+    "LDU":  ["ld"],
+    "LDPC": ["ldpc"],
+    "MUL":  ["mul", "divu", "divs", "modu", "mods"],
+    "MULI": ["mul", "divu", "divs", "modu", "mods"],
+    "CFG":  ["read", "write", "rte", "sys"],
+    "IDX":  ["idx1", "idx2", "idx4"],
+    "FPU":  ["fadd", "fsub", "fmul", "fdiv", "fsqrt", "fcmp", "itof", "ftoi"],
+}
+
+def classify(dis):
+    """Map one line of disassembly to its (format, sub-op) cell, or None if unrecognised.
+
+    The disassembler prints register operands as $n (and $0 as "0") and the
+    immediates of the ALUI/MULI forms in hex, so a trailing "0x" operand is
+    what marks the immediate form."""
+    parts = dis.split(None, 1)
+    if not parts:
+        return None
+    m = parts[0]
+    ops = [o.strip() for o in parts[1].split(",")] if len(parts) > 1 else []
+    last_is_imm = bool(ops) and ops[-1].startswith("0x")
+
+    if m in ALU_OPS:
+        return ("ALUI" if last_is_imm else "ALU"), m
+    if m == "ld":
+        # "ld $d, $a" is an OR, "ld $d, 123" an OR immediate, "ld $d, 0x..." an LDU.
+        # "ld $d, 0" could be either OR; it is counted as the immediate the assembler emits.
+        if last_is_imm:
+            return "LDU", "ld"
+        return ("ALU" if ops[-1].startswith("$") else "ALUI"), "or"
+    if m in ISA["LD"]:
+        return "LD", m
+    if m in ISA["ST"]:
+        return "ST", m
+    if m in ISA["Bcc"]:
+        return "Bcc", m
+    if m == "jsr":
+        return "JMP", "jsr"
+    if m == "ret":
+        return "JMPR", "ret"
+    if m == "jmp":
+        return ("JMPR" if ops[-1].endswith("]") else "JMP"), "jmp"
+    if m == "ldpc":
+        return "LDPC", "ldpc"
+    if m in ISA["MUL"]:
+        return ("MULI" if last_is_imm else "MUL"), m
+    if m == "cfg":
+        return "CFG", "write" if len(ops) == 3 else "read"
+    if m in ("rte", "sys"):
+        return "CFG", m
+    if m in ISA["IDX"]:
+        return "IDX", m
+    if m in ISA["FPU"]:
+        return "FPU", m
+    return None
+
+def count_trace(filename):
+    """Count executions of each distinct disassembly line in an emulator trace.
+
+    Lines are read in blocks and counted with np.unique, so the Python work
+    per block is proportional to the number of distinct instructions."""
+    counts = Counter()
+    with open(filename, errors="replace") as f:
+        while True:
+            lines = f.readlines(CHUNK_LINES * 64)
+            if not lines:
+                break
+            dis = np.array([line[DIS_START:DIS_END] for line in lines if line[8:9] == ":"])
+            if len(dis) == 0:
+                continue
+            uniq, n = np.unique(dis, return_counts=True)
+            counts.update(dict(zip(uniq.tolist(), n.tolist())))
+    return counts
+
+def trace_test(test_file, root, timeout=None):
+    """Assemble a test and run it on the emulator with tracing.
+
+    Returns (counts, status): the instruction counts of whatever trace was
+    written, and None, FAIL ASM, FAIL SIM or TIMEOUT."""
+    workdir = regress.make_sandbox(test_file, root)
+    test_file = os.path.abspath(test_file)
+    status = None
+    try:
+        subprocess.run(["f32asm.exe", test_file], cwd=workdir, stdout=subprocess.DEVNULL,
+                       check=True, timeout=timeout)
+        status = "FAIL SIM"
+        subprocess.run(["f32sim.exe", "-t", "asm.hex"], cwd=workdir, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.STDOUT, check=True, timeout=timeout)
+        status = None
+    except subprocess.TimeoutExpired:
+        status = "TIMEOUT"
+    except (subprocess.CalledProcessError, OSError):
+        status = status or "FAIL ASM"
+    trace = os.path.join(workdir, TRACE_FILE)
+    counts = count_trace(trace) if os.path.exists(trace) else Counter()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return counts, status
+
+def coverage_matrix(counts):
+    """Aggregate disassembly counts into {format: {sub-op: executions}}, including zero entries."""
+    matrix = {fmt: {op: 0 for op in ops} for fmt, ops in ISA.items()}
+    for dis, n in counts.items():
+        cell = classify(dis)
+        if cell and cell[1] in matrix[cell[0]]:
+            matrix[cell[0]][cell[1]] += n
+    return matrix
+
+def print_matrix(matrix, tests_hit=None):
+    covered = sum(n > 0 for ops in matrix.values() for n in ops.values())
+    total = sum(len(ops) for ops in matrix.values())
+    for fmt, ops in matrix.items():
+        cells = []
+        for op, n in ops.items():
+            text = f"{op}={n}"
+            if tests_hit is not None and n:
+                text += f"({len(tests_hit[fmt, op])})"
+            cells.append(f"{regress.RED}{text}{regress.RESET}" if n == 0 else text)
+        print(f"{fmt:5} " + " ".join(cells))
+    print(f"{covered}/{total} format/op combinations covered")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ISA coverage of the regression tests, from emulator traces.")
+    parser.add_argument("tests", nargs="*", help="Test programs (default: all of testcases/).")
+    parser.add_argument("--traces", nargs="+", help="Use existing sim_traace.log files instead of running tests.")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Parallel jobs (0 = one per core).")
+    parser.add_argument("--json", metavar="FILE", help="Write the coverage matrix as JSON.")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-test time limit in seconds.")
+    args = parser.parse_args()
+
+    per_source = {}
+    failed = {}
+    if args.traces:
+        for trace in args.traces:
+            per_source[trace] = count_trace(trace)
+    else:
+        tests = args.tests or regress.list_tests()
+        root = tempfile.mkdtemp(prefix="coverage_", dir=".")
+        try:
+            with ProcessPoolExecutor(max_workers=args.jobs or os.cpu_count()) as pool:
+                results = pool.map(trace_test, tests, [root] * len(tests), [args.timeout] * len(tests))
+                for test, (counts, status) in zip(tests, results):
+                    per_source[test] = counts
+                    if status:
+                        failed[test] = status
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    total = Counter()
+    tests_hit = {(fmt, op): set() for fmt, ops in ISA.items() for op in ops}
+    for source, counts in per_source.items():
+        total.update(counts)
+        for fmt, ops in coverage_matrix(counts).items():
+            for op, n in ops.items():
+                if n:
+                    tests_hit[fmt, op].add(source)
+
+    matrix = coverage_matrix(total)
+    print_matrix(matrix, tests_hit)
+    unknown = sorted({d.split(None, 1)[0] for d in total if d.strip() and classify(d) is None})
+    if unknown:
+        print(f"Unclassified: {', '.join(unknown)}")
+    for test, status in failed.items():
+        print(f"{regress.RED}{status}{regress.RESET} {test} (coverage up to the failure only)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"matrix": matrix,
+                       "tests": {f"{fmt}.{op}": sorted(s) for (fmt, op), s in tests_hit.items()},
+                       "failed": failed}, f, indent=1)
+    sys.exit(1 if failed else 0)
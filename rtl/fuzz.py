@@ -0,0 +1,230 @@
+import os
+import sys
+import shutil
+import random
+import argparse
+
+import regress
+
+# Register usage in generated programs
+DATA_REGS = list(range(1, 20))   # Random data, freely read and written
+BASE_REG = 20                    # Base address of the data region
+SCRATCH = [21, 22, 23, 24]       # Used by the preamble and for guarding operands
+LOOP_REG = 25                    # Loop counter
+IDX_REGS = [26, 27]              # Operands for IDX instructions
+# $30 holds the return address (0) used by the final ret to end the simulation
+
+DATA_BASE = 0x2000               # Data region, initialised before the random code runs
+DATA_SIZE = 0x400
+
+ALU_OPS = ["and", "or", "xor", "add", "sub", "clt", "cltu"]
+SHIFT_OPS = ["lsl", "lsr", "asr"]
+BRANCH_OPS = ["beq", "bne", "blt", "bge", "bltu", "bgeu"]
+LOAD_OPS = {"ldb": 1, "ldh": 2, "ldw": 4}
+STORE_OPS = {"stb": 1, "sth": 2, "stw": 4}
+DIV_OPS = ["divu", "divs", "modu", "mods"]
+IDX_OPS = {"idx1": 1, "idx2": 2, "idx4": 4}
+FPU_OPS = ["fadd", "fsub", "fmul", "itof", "ftoi"]
+
+# Relative frequency of each kind of instruction
+WEIGHTS = {
+    "alu": 30,
+    "alui": 25,
+    "shift": 8,
+    "ld": 6,
+    "ldbig": 3,
+    "load": 10,
+    "store": 10,
+    "mul": 5,
+    "div": 3,
+    "idx": 2,
+    "ldpc": 1,
+    "fpu": 0,
+    "branch": 6,
+    "loop": 2,
+}
+
+def s13(rng):
+    return rng.randint(-4096, 4095)
+
+class Generator:
+    """Builds one constrained-random test program.
+
+    All memory accesses stay inside the data region and are aligned, branches
+    only go forward or close a counted loop, and divisors are forced
+    nonzero, so every program terminates without exceptions."""
+
+    def __init__(self, seed, length=200, fpu=False):
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.length = length
+        self.weights = dict(WEIGHTS)
+        if fpu:
+            self.weights["fpu"] = 4
+        self.labels = 0
+
+    def label(self, prefix):
+        self.labels += 1
+        return f"{prefix}_{self.labels}"
+
+    def reg(self, zero=False):
+        # The assembler spells the zero register as a bare 0 (it has no $0)
+        if zero and self.rng.random() < 0.05:
+            return "0"
+        return f"${self.rng.choice(DATA_REGS)}"
+
+    def instruction(self, allow_loop=True):
+        """Return a list of lines for one randomly chosen operation."""
+        rng = self.rng
+        kinds = [k for k in self.weights if self.weights[k] and (allow_loop or k != "loop")]
+        kind = rng.choices(kinds, [self.weights[k] for k in kinds])[0]
+        d, a, b = self.reg(), self.reg(zero=True), self.reg(zero=True)
+
+        if kind == "alu":
+            return [f"{rng.choice(ALU_OPS)} {d}, {a}, {b}"]
+        if kind == "alui":
+            return [f"{rng.choice(ALU_OPS)} {d}, {a}, {s13(rng)}"]
+        if kind == "shift":
+            op = rng.choice(SHIFT_OPS)
+            if rng.random() < 0.5:
+                return [f"{op} {d}, {a}, {rng.randint(0, 31)}"]
+            return [f"{op} {d}, {a}, {b}"]
+        if kind == "ld":
+            return [f"ld {d}, {s13(rng)}"]
+        if kind == "ldbig":
+            return [f"ld {d}, 0x{rng.getrandbits(32):08x}"]
+        if kind == "ldpc":
+            target = self.label("pc")
+            return [f"ld {d}, {target}", f"{target}:"]
+        if kind == "load":
+            op, size = rng.choice(list(LOAD_OPS.items()))
+            return [f"{op} {d}, ${BASE_REG}[{rng.randrange(0, DATA_SIZE, size)}]"]
+        if kind == "store":
+            op, size = rng.choice(list(STORE_OPS.items()))
+            return [f"{op} {a}, ${BASE_REG}[{rng.randrange(0, DATA_SIZE, size)}]"]
+        if kind == "mul":
+            if rng.random() < 0.5:
+                return [f"mul {d}, {a}, {s13(rng)}"]
+            return [f"mul {d}, {a}, {b}"]
+        if kind == "div":
+            g = f"${SCRATCH[3]}"
+            return [f"or {g}, {b}, 1", f"{rng.choice(DIV_OPS)} {d}, {a}, {g}"]
+        if kind == "idx":
+            op = rng.choice(list(IDX_OPS))
+            i, n = f"${IDX_REGS[0]}", f"${IDX_REGS[1]}"
+            return [f"and {i}, {a}, 0xff", f"ld {n}, 0x100", f"{op} {d}, {i}, {n}"]
+        if kind == "fpu":
+            op = rng.choice(FPU_OPS)
+            if op in ("itof", "ftoi"):
+                return [f"{op} {d}, {a}"]
+            return [f"{op} {d}, {a}, {b}"]
+        if kind == "branch":
+            # Forward branch over a few instructions
+            target = self.label("skip")
+            lines = [f"{rng.choice(BRANCH_OPS)} {a}, {b}, {target}"]
+            for _ in range(rng.randint(1, 4)):
+                lines += self.instruction(allow_loop=False)
+            return lines + [f"{target}:"]
+        if kind == "loop":
+            # Counted loop; the body never touches the counter
+            top = self.label("loop")
+            lines = [f"ld ${LOOP_REG}, {rng.randint(1, 8)}", f"{top}:"]
+            for _ in range(rng.randint(2, 10)):
+                lines += self.instruction(allow_loop=False)
+            return lines + [f"sub ${LOOP_REG}, 1", f"bne ${LOOP_REG}, 0, {top}"]
+        raise ValueError(kind)
+
+    def preamble(self):
+        rng = self.rng
+        p, end, v = (f"${r}" for r in SCRATCH[:3])
+        lines = [
+            f"# Fuzz program, seed {self.seed}",
+            f"ld ${BASE_REG}, 0x{DATA_BASE:x}",
+            "",
+            "# Initialise the data region so loads are deterministic",
+            f"ld {p}, ${BASE_REG}",
+            f"ld {end}, 0x{DATA_BASE + DATA_SIZE:x}",
+            f"ld {v}, 0x{rng.getrandbits(32):08x}",
+            "init_loop:",
+            f"stw {v}, {p}[0]",
+            f"xor {v}, {v}, {p}",
+            f"add {v}, {v}, {s13(rng)}",
+            f"add {p}, 4",
+            f"bne {p}, {end}, init_loop",
+            "",
+            "# Random register contents",
+        ]
+        for r in DATA_REGS:
+            lines.append(f"ld ${r}, 0x{rng.getrandbits(32):08x}")
+        return lines + ["", "# Random code"]
+
+    def program(self):
+        lines = self.preamble()
+        count = 0
+        while count < self.length:
+            instr = self.instruction()
+            lines += instr
+            count += len(instr)
+        return "\n".join(lines + ["", "ret", ""])
+
+def generate(seed, length=200, fpu=False):
+    """Return the source of the fuzz program for a seed."""
+    return Generator(seed, length, fpu).program()
+
+def run_batch(seeds, workdir, jobs, length, fpu, faildir, timeout):
+    """Generate and run one batch of programs. Returns the list of failing (seed, status)."""
+    files = []
+    for seed in seeds:
+        path = os.path.join(workdir, f"fuzz_{seed}.f32")
+        with open(path, "w") as f:
+            f.write(generate(seed, length, fpu))
+        files.append(path)
+
+    failures = []
+    for path, status, _, _ in regress.iter_results(files, jobs, timeout=timeout):
+        if status != "PASS":
+            seed = int(os.path.basename(path)[5:-4])
+            failures.append((seed, status))
+            shutil.copy(path, faildir)
+        os.remove(path)
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the RTL against the emulator with random programs.")
+    parser.add_argument("--seed", type=int, default=1, help="First seed.")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="Number of programs to run (0 = forever).")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Parallel jobs (0 = one per core).")
+    parser.add_argument("--length", type=int, default=200, help="Approximate instructions per program.")
+    parser.add_argument("--fpu", action="store_true", help="Include FPU instructions.")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-program time limit in seconds.")
+    parser.add_argument("--out", default="fuzz_failures", help="Directory for failing programs.")
+    parser.add_argument("--emit", action="store_true", help="Print the program for --seed and exit.")
+    args = parser.parse_args()
+
+    if args.emit:
+        print(generate(args.seed, args.length, args.fpu))
+        sys.exit(0)
+
+    if regress.build.build() != 0:
+        sys.exit(1)
+
+    jobs = args.jobs or os.cpu_count()
+    os.makedirs(args.out, exist_ok=True)
+    workdir = os.path.abspath(os.path.join(args.out, "pending"))
+    os.makedirs(workdir, exist_ok=True)
+
+    seed = args.seed
+    run = 0
+    failures = []
+    while args.count == 0 or run < args.count:
+        n = jobs * 4 if args.count == 0 else min(jobs * 4, args.count - run)
+        batch = list(range(seed, seed + n))
+        for fail_seed, status in run_batch(batch, workdir, jobs, args.length, args.fpu, args.out, args.timeout):
+            print(f"seed {fail_seed} {regress.RED}{status}{regress.RESET}")
+            failures.append(fail_seed)
+        seed += n
+        run += n
+        print(f"{run} programs, {len(failures)} failures")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,161 @@
+import os
+import sys
+import wave
+import argparse
+import numpy as np
+
+# Convert the RTL's I2S capture (i2s_samples.txt, "left right" per line as
+# written by i2s_receiver.sv) to a WAV file, and compare a capture against
+# reference audio.
+
+CAPTURE_FILE = "i2s_samples.txt"
+SAMPLE_RATE = 48828             # 12.5 MHz MCLK / 256 (i2s_output.sv)
+CHUNK_BYTES = 16 << 20          # Text parsed per block
+
+DEFAULT_SNR = 40.0              # dB
+DEFAULT_SPECTRAL = 3.0          # dB
+FFT_SIZE = 4096
+SPECTRAL_FLOOR = -60.0          # dB below the reference's peak; quieter bins are not compared
+
+def load_capture(filename=CAPTURE_FILE):
+    """Parse a capture into an (n, 2) int16 array of left/right samples."""
+    blocks = []
+    carry = b""
+    with open(filename, "rb") as f:
+        while True:
+            block = f.read(CHUNK_BYTES)
+            text = carry + block
+            cut = text.rfind(b"\n") + 1 if block else len(text)
+            text, carry = text[:cut], text[cut:]
+            if not text:
+                break
+            blocks.append(np.fromstring(text.decode("ascii"), dtype=np.int32, sep=" "))
+    values = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int32)
+    if len(values) % 2:
+        raise ValueError(f"{filename}: expected 'left right' sample pairs")
+    if len(values) and (values.min() < -32768 or values.max() > 32767):
+        raise ValueError(f"{filename}: sample out of 16-bit range")
+    return values.astype(np.int16).reshape(-1, 2)
+
+def write_wav(samples, filename, rate=SAMPLE_RATE):
+    with wave.open(filename, "wb") as w:
+        w.setnchannels(samples.shape[1])
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.astype("<i2").tobytes())
+
+def load_audio(filename):
+    """Load reference audio as (n, 2) int16: a 16-bit WAV, a capture text file, or
+    raw interleaved stereo 16-bit little-endian PCM (anything else)."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".wav":
+        with wave.open(filename, "rb") as w:
+            if w.getsampwidth() != 2:
+                raise ValueError(f"{filename}: only 16-bit WAV files are supported")
+            channels = w.getnchannels()
+            data = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2").reshape(-1, channels)
+    elif ext == ".txt":
+        return load_capture(filename)
+    else:
+        data = np.fromfile(filename, dtype="<i2").reshape(-1, 2)
+    if data.shape[1] == 1:
+        data = np.repeat(data, 2, axis=1)
+    return data[:, :2].astype(np.int16)
+
+def find_lag(capture, reference):
+    """Offset of the reference within the capture that maximises their cross-correlation.
+
+    Computed on the mono mix with FFTs. A positive lag means the capture
+    starts lag samples later than the reference."""
+    a = capture.mean(axis=1)
+    b = reference.mean(axis=1)
+    n = 1 << int(np.ceil(np.log2(len(a) + len(b))))
+    corr = np.fft.irfft(np.fft.rfft(a, n) * np.conj(np.fft.rfft(b, n)), n)
+    # Lags 0..len(a)-1 are at the start, negative lags wrap around to the end
+    lags = np.concatenate([np.arange(len(a)), np.arange(-len(b) + 1, 0)])
+    corr = np.concatenate([corr[:len(a)], corr[n - len(b) + 1:]])
+    return int(lags[np.argmax(corr)])
+
+def align(capture, reference, lag):
+    """Return the overlapping parts of the capture and reference for a lag."""
+    if lag >= 0:
+        capture = capture[lag:]
+    else:
+        reference = reference[-lag:]
+    n = min(len(capture), len(reference))
+    return capture[:n].astype(np.float64), reference[:n].astype(np.float64)
+
+def snr(capture, reference):
+    """Signal-to-noise ratio in dB of the capture, taking the reference as the signal."""
+    noise = np.sum((capture - reference) ** 2)
+    signal = np.sum(reference ** 2)
+    if noise == 0:
+        return float("inf")
+    return 10 * np.log10(max(signal, 1e-12) / noise)
+
+def spectrum(samples, size=FFT_SIZE):
+    """Average power spectrum in dB of the mono mix, over Hann-windowed blocks of size samples."""
+    mono = samples.mean(axis=1)
+    blocks = len(mono) // size
+    if blocks == 0:
+        size = len(mono)
+        blocks = 1
+    frames = mono[:blocks * size].reshape(blocks, size) * np.hanning(size)
+    power = np.mean(np.abs(np.fft.rfft(frames, axis=1)) ** 2, axis=0)
+    return 10 * np.log10(power + 1e-12)
+
+def spectral_difference(capture, reference):
+    """Largest and mean difference in dB between the spectra, over the bins where
+    the reference is within SPECTRAL_FLOOR of its peak."""
+    ref = spectrum(reference)
+    cap = spectrum(capture)
+    loud = ref > ref.max() + SPECTRAL_FLOOR
+    diff = np.abs(cap[loud] - ref[loud])
+    return float(diff.max()), float(diff.mean())
+
+def compare(capture, reference, min_snr=DEFAULT_SNR, max_spectral=DEFAULT_SPECTRAL):
+    """Align a capture with a reference and measure how far it is off.
+
+    Returns (ok, results) where results holds the lag, overlap length, SNR and
+    spectral differences."""
+    lag = find_lag(capture, reference)
+    cap, ref = align(capture, reference, lag)
+    if len(cap) == 0:
+        return False, {"lag": lag, "samples": 0}
+    worst, mean = spectral_difference(cap, ref)
+    results = {"lag": lag, "samples": len(cap), "snr": float(snr(cap, ref)), "spectral_max": worst, "spectral_mean": mean}
+    ok = bool(results["snr"] >= min_snr and worst <= max_spectral)
+    return ok, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert I2S captures to WAV and compare them against reference audio.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("wav", help="Convert a capture to a 16-bit stereo WAV file.")
+    p.add_argument("capture", nargs="?", default=CAPTURE_FILE)
+    p.add_argument("wav_file", nargs="?", help="Output file (default capture name with .wav)")
+    p.add_argument("--rate", type=int, default=SAMPLE_RATE, help="Sample rate in Hz")
+
+    p = sub.add_parser("compare", help="Compare a capture with reference audio (.wav, .txt or raw PCM).")
+    p.add_argument("capture")
+    p.add_argument("reference")
+    p.add_argument("--min-snr", type=float, default=DEFAULT_SNR, help="Lowest passing SNR in dB")
+    p.add_argument("--max-spectral", type=float, default=DEFAULT_SPECTRAL,
+                   help="Largest passing spectral difference in dB")
+
+    args = parser.parse_args()
+
+    if args.cmd == "wav":
+        samples = load_capture(args.capture)
+        out = args.wav_file or os.path.splitext(args.capture)[0] + ".wav"
+        write_wav(samples, out, args.rate)
+        print(f"Wrote {len(samples)} samples ({len(samples) / args.rate:.2f}s) to {out}")
+    else:
+        ok, r = compare(load_audio(args.capture), load_audio(args.reference), args.min_snr, args.max_spectral)
+        if r["samples"] == 0:
+            print("Capture and reference do not overlap")
+        else:
+            print(f"Lag {r['lag']} samples, {r['samples']} compared, SNR {r['snr']:.1f} dB, "
+                  f"spectral difference max {r['spectral_max']:.2f} dB mean {r['spectral_mean']:.2f} dB")
+        print("PASS" if ok else "FAIL")
+        sys.exit(0 if ok else 1)
@@ -0,0 +1,245 @@
+import sys
+import argparse
+import numpy as np
+
+import pack_vob
+import vob_render
+
+# Compile a triangle mesh into a stream of VOBs for one frame.
+#
+# Models are the binary files written by falconos/elite/convertObj.py: an
+# int32 vertex count and float32 x, y, z per vertex, then an int32 face count
+# and int32 v1, v2, v3, colour per face. Vertices are rotated and translated
+# into camera space, where the camera looks along +z, and projected the same
+# way as the Elite demo (scale 400 / z about the viewport centre). Faces facing
+# away from the camera, or with a vertex behind the near plane, are dropped.
+#
+# Each remaining triangle is split at its middle vertex into two trapezoids.
+# Where the bend is on the right edge (so the left edge is straight) the two
+# can be merged into one VOB that breaks x2 (CTRL_BRK_SEL) on the row above
+# the middle vertex. The averaged step the hardware takes on that row leaves
+# the lower edge off by the slope change times the vertex's distance from
+# the row boundary; if that is within MAX_BREAK_ERROR pixels the VOB is
+# merged, otherwise the trapezoids are emitted as two VOBs, as they are when
+# the bend is on the left, since z/u/v step along the left edge and cannot
+# follow a bend in it.
+#
+# Faces are flat shaded solid fills (MODE_SOLID) with both colour fields set
+# to the face's palette colour as 24-bit RGB. The hardware always z tests, so
+# camera depth is scaled to 0..Z_RANGE across the frame, and VOBs are emitted
+# near to far so that the nearer face wins where int(z) ties.
+
+FOCAL = 400.0
+NEAR = 0.1
+VIEWPORT = (8, 8, 631, 271)         # x1, y1, x2, y2 of the Elite 3D view (inclusive)
+MAX_BREAK_ERROR = 0.5               # pixels
+FIX_LIMIT = 2047.0                  # Largest magnitude representable in 12.12
+Z_RANGE = 2000.0                    # int(z) span of the frame's depth range, below vob_render.Z_FAR
+
+def load_model(filename):
+    """Return (vertices (n, 3) float64, faces (m, 4) int64) from a convertObj.py model file."""
+    data = np.fromfile(filename, dtype=np.uint8)
+    n = int(data[:4].view("<i4")[0])
+    vertices = data[4:4 + 12 * n].view("<f4").reshape(n, 3).astype(np.float64)
+    offset = 4 + 12 * n
+    m = int(data[offset:offset + 4].view("<i4")[0])
+    faces = data[offset + 4:offset + 4 + 16 * m].view("<i4").reshape(m, 4).astype(np.int64)
+    return vertices, faces
+
+def rotation_matrix(rx, ry, rz):
+    """Object rotation in degrees, the same matrix as createRotationMatrix in the Elite demo."""
+    cx, sx = np.cos(np.radians(rx)), np.sin(np.radians(rx))
+    cy, sy = np.cos(np.radians(ry)), np.sin(np.radians(ry))
+    cz, sz = np.cos(np.radians(rz)), np.sin(np.radians(rz))
+    return np.array([
+        [cy * cz,                 -cy * sz,                 sy],
+        [sx * sy * cz + cx * sz,  -sx * sy * sz + cx * cz,  -sx * cy],
+        [-cx * sy * cz + sx * sz, cx * sy * sz + sx * cz,   cx * cy],
+    ])
+
+def project_faces(vertices, faces, rotation, position, center):
+    """Transform and project all faces.
+
+    Returns (screen, depth, colour) for the visible faces: screen is (m, 3, 2)
+    projected x, y per corner and depth (m, 3) the camera-space z."""
+    cam = vertices @ rotation.T + np.asarray(position, dtype=np.float64)
+    tri = cam[faces[:, :3]]                                     # (m, 3, 3)
+    u = tri[:, 1] - tri[:, 0]
+    v = tri[:, 2] - tri[:, 0]
+    facing = u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0] <= 0         # Elite's back-face test
+    in_front = (tri[:, :, 2] > NEAR).all(axis=1)
+    keep = facing & in_front
+    tri = tri[keep]
+    screen = tri[:, :, :2] * (FOCAL / tri[:, :, 2:3]) + np.asarray(center, dtype=np.float64)
+    return screen, tri[:, :, 2], faces[keep, 3]
+
+def plane_gradients(screen, attr):
+    """d/dx and d/dy of an attribute interpolated linearly across each triangle in screen space."""
+    x, y = screen[:, :, 0], screen[:, :, 1]
+    dx1, dx2 = x[:, 1] - x[:, 0], x[:, 2] - x[:, 0]
+    dy1, dy2 = y[:, 1] - y[:, 0], y[:, 2] - y[:, 0]
+    da1, da2 = attr[:, 1] - attr[:, 0], attr[:, 2] - attr[:, 0]
+    denom = dx1 * dy2 - dx2 * dy1
+    denom = np.where(denom == 0, 1, denom)
+    return (da1 * dy2 - da2 * dy1) / denom, (da2 * dx1 - da1 * dx2) / denom
+
+def trapezoids(screen, depth, viewport):
+    """Split every triangle at its middle vertex.
+
+    Returns a dict of per-triangle arrays describing the top and bottom
+    trapezoids (rows, edge points and slopes) plus depth gradients."""
+    order = np.argsort(screen[:, :, 1], axis=1, kind="stable")
+    idx = np.arange(len(screen))[:, None]
+    p = screen[idx, order]                                       # Sorted top, middle, bottom
+    top, mid, bot = p[:, 0], p[:, 1], p[:, 2]
+
+    def slope(a, b):
+        dy = b[:, 1] - a[:, 1]
+        return np.where(dy > 0, (b[:, 0] - a[:, 0]) / np.where(dy > 0, dy, 1), 0.0)
+
+    # First row whose pixel centre is at or below each vertex, clamped to the viewport
+    def row(y):
+        return np.clip(np.ceil(y - 0.5), viewport[1], viewport[3] + 1).astype(np.int64)
+
+    t = {"ystart": row(top[:, 1]), "ymid": row(mid[:, 1]), "yend": row(bot[:, 1]),
+         "top": top, "mid": mid,
+         "long": slope(top, bot), "upper": slope(top, mid), "lower": slope(mid, bot)}
+    # The middle vertex is on the left if it is left of the long edge at its height
+    t["mid_left"] = mid[:, 0] < top[:, 0] + t["long"] * (mid[:, 1] - top[:, 1])
+    t["dzdx"], t["dzdy"] = plane_gradients(screen, depth)
+    t["z0"] = depth[:, 0]
+    t["p0"] = screen[:, 0]
+    return t
+
+def edge_x(point, slope, y):
+    """x of an edge through point at the centre of row y, plus 0.5 so that the
+    renderer's int(x) gives the first pixel whose centre is inside."""
+    return point[:, 0] + slope * (y + 0.5 - point[:, 1]) + 0.5
+
+def make_vobs(t, sel, r0, r1, left_point, left_slope, right_point, right_slope, brk_y, brk_dxdy, ctrl):
+    """VOB fields for the trapezoids of the selected triangles (sel is a boolean mask)."""
+    def pick(a):
+        return a[sel]
+    r0, r1 = pick(r0), pick(r1)
+    lp, ls, rp, rs = pick(left_point), pick(left_slope), pick(right_point), pick(right_slope)
+    x1 = edge_x(lp, ls, r0)
+    x2 = edge_x(rp, rs, r0)
+    dzdx, dzdy = pick(t["dzdx"]), pick(t["dzdy"])
+    # z at the centre of the first pixel drawn on the first row
+    z = pick(t["z0"]) + dzdx * (np.floor(x1) + 0.5 - pick(t["p0"])[:, 0]) + dzdy * (r0 + 0.5 - pick(t["p0"])[:, 1])
+    return {"ystart": r0, "yend": r1, "brk_y": pick(brk_y), "brk_dxdy": pick(brk_dxdy), "ctrl": pick(ctrl),
+            "x1": x1, "x2": x2, "dx1dy": ls, "dx2dy": rs, "z": z, "dzdx": dzdx, "dzdy": dzdy + dzdx * ls}
+
+def face_colors(colors, palette):
+    """24-bit RGB of each face's palette colour."""
+    rgb = palette[colors & 0xFF].astype(np.int64)
+    return (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+def compile_vobs(screen, depth, colors, viewport=VIEWPORT, max_break_error=MAX_BREAK_ERROR, palette=None):
+    """Turn projected triangles into VOB field arrays for pack_vob.pack_vobs, near to far.
+
+    colors are palette indices, converted to RGB with palette (as from
+    vob_render.load_palette; default palette.hex)."""
+    if palette is None:
+        palette = vob_render.load_palette()
+    span = depth.max() - depth.min() if len(depth) else 0.0
+    depth = (depth - depth.min()) * (Z_RANGE / span) if span > 0 else np.zeros_like(depth)
+    t = trapezoids(screen, depth, viewport)
+    n = len(screen)
+    left_bend = t["mid_left"]
+    # Where the right edge bends, the break is on row ymid - 1. Its averaged
+    # step assumes the vertex is on the boundary below that row's centre, so
+    # the lower edge is off by the slope change times the distance from there
+    error = (t["ymid"] - t["mid"][:, 1]) * (t["upper"] - t["lower"])
+    has_top = t["ymid"] > t["ystart"]
+    has_bot = t["yend"] > t["ymid"]
+    merge = (~left_bend & (np.abs(error) <= max_break_error)) | ~has_top | ~has_bot
+
+    # Edge points and slopes of the two trapezoids
+    long_pt, top_pt, mid_pt = t["top"], t["top"], t["mid"]
+    upper_l = np.where(left_bend[:, None], top_pt, long_pt)
+    upper_ls = np.where(left_bend, t["upper"], t["long"])
+    upper_r = np.where(left_bend[:, None], long_pt, top_pt)
+    upper_rs = np.where(left_bend, t["long"], t["upper"])
+    lower_l = np.where(left_bend[:, None], mid_pt, long_pt)
+    lower_ls = np.where(left_bend, t["lower"], t["long"])
+    lower_r = np.where(left_bend[:, None], long_pt, mid_pt)
+    lower_rs = np.where(left_bend, t["long"], t["lower"])
+
+    base_ctrl = vob_render.MODE_SOLID
+    no_break = t["yend"]                                         # brk_y outside the rows
+    zero = np.zeros(n)
+    plain = np.full(n, base_ctrl)
+    parts = []
+    # Merged: one VOB covering all rows, breaking the right edge if there is a top half
+    merged_ctrl = np.where(has_top & has_bot, base_ctrl | vob_render.CTRL_BRK_SEL, base_ctrl)
+    first_l = np.where(has_top[:, None], upper_l, lower_l)
+    first_ls = np.where(has_top, upper_ls, lower_ls)
+    first_r = np.where(has_top[:, None], upper_r, lower_r)
+    first_rs = np.where(has_top, upper_rs, lower_rs)
+    parts.append((merge, make_vobs(t, merge, t["ystart"], t["yend"], first_l, first_ls, first_r, first_rs,
+                                   np.where(has_top & has_bot, t["ymid"] - 1, no_break), t["lower"], merged_ctrl)))
+    split = ~merge
+    parts.append((split, make_vobs(t, split, t["ystart"], t["ymid"], upper_l, upper_ls, upper_r, upper_rs,
+                                   no_break, zero, plain)))
+    parts.append((split, make_vobs(t, split, t["ymid"], t["yend"], lower_l, lower_ls, lower_r, lower_rs,
+                                   no_break, zero, plain)))
+
+    # Concatenate and order near to far by the triangle's mean depth
+    tri = np.concatenate([np.nonzero(sel)[0] for sel, _ in parts])
+    fields = {k: np.concatenate([f[k] for _, f in parts]) for k in parts[0][1]}
+    keep = fields["yend"] > fields["ystart"]
+    order = np.argsort(depth.mean(axis=1)[tri][keep], kind="stable")
+    fields = {k: v[keep][order] for k, v in fields.items()}
+    tri = tri[keep][order]
+
+    count = len(tri)
+    fields["xclip1"] = np.full(count, viewport[0])
+    fields["xclip2"] = np.full(count, viewport[2] + 1)
+    rgb = face_colors(colors, palette)[tri]
+    fields["src_addr"] = rgb
+    fields["src_stride"] = rgb
+    for name in ["u", "v", "dudx", "dvdx", "dudy", "dvdy"]:
+        fields[name] = np.zeros(count)
+    # Drop anything 12.12 cannot represent (triangles far off screen)
+    ok = np.ones(count, dtype=bool)
+    for name in pack_vob.FIX_FIELDS:
+        ok &= np.abs(fields[name]) <= FIX_LIMIT
+    return {k: v[ok] for k, v in fields.items()}, int(count - ok.sum())
+
+def parse_vector(text):
+    return tuple(float(v) for v in text.split(","))
+
+if __name__ == "__main__":
+    from PIL import Image
+
+    parser = argparse.ArgumentParser(description="Compile a 3D model into a VOB stream for one frame.")
+    parser.add_argument("model", help="Model file from falconos/elite/convertObj.py")
+    parser.add_argument("--rotate", type=parse_vector, default=(0.0, 0.0, 0.0), help="Rotation rx,ry,rz in degrees")
+    parser.add_argument("--position", type=parse_vector, default=(0.0, 0.0, 15.0),
+                        help="Model position x,y,z relative to the camera")
+    parser.add_argument("--max-break-error", type=float, default=MAX_BREAK_ERROR,
+                        help="Largest edge error in pixels accepted to merge a triangle into one VOB (0 = never)")
+    parser.add_argument("--palette", default="palette.hex", help="Palette the face colours index")
+    parser.add_argument("--hex", default="vob_image.hex", help="Hex word image")
+    parser.add_argument("--bin", default="vob_image.bin", help="Raw binary image")
+    parser.add_argument("--render", metavar="PNG", help="Also render the stream with vob_render.py")
+    args = parser.parse_args()
+
+    center = ((VIEWPORT[0] + VIEWPORT[2]) // 2, (VIEWPORT[1] + VIEWPORT[3]) // 2)
+    vertices, faces = load_model(args.model)
+    screen, depth, colors = project_faces(vertices, faces, rotation_matrix(*args.rotate), args.position, center)
+    palette = vob_render.load_palette(args.palette)
+    fields, dropped = compile_vobs(screen, depth, colors, max_break_error=args.max_break_error, palette=palette)
+    recs = pack_vob.pack_vobs(fields)
+    pack_vob.write_hex(recs, args.hex)
+    pack_vob.write_bin(recs, args.bin)
+    print(f"{len(faces)} faces, {len(screen)} visible, {len(recs)} VOBs" +
+          (f", {dropped} dropped (out of 12.12 range)" if dropped else ""))
+
+    if args.render:
+        renderer = vob_render.Renderer(palette=palette)
+        renderer.render(recs)
+        Image.fromarray(renderer.frame, "RGB").save(args.render)
+        print(f"Rendered to {args.render}")
+    sys.exit(0)
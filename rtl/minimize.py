@@ -0,0 +1,119 @@
+import os
+import sys
+import shutil
+import tempfile
+import argparse
+
+import regress
+
+# Failures that show the RTL and emulator disagree. Anything else (the
+# assembler rejecting a reduced program, a hang, ...) means the reduction
+# broke the program rather than preserving the bug.
+DIVERGENCES = {"FAIL", "FAIL MEM", "FAIL UART"}
+
+def strip_source(lines):
+    """Drop comments and blank lines, which cannot affect the result."""
+    out = []
+    for line in lines:
+        in_string = False
+        for i, c in enumerate(line):
+            if c == '"':
+                in_string = not in_string
+            elif c == "#" and not in_string:
+                line = line[:i]
+                break
+        if line.strip():
+            out.append(line.rstrip())
+    return out
+
+class Minimizer:
+    """Delta-debugging (ddmin) reduction of a failing test program.
+
+    Candidate programs are the current program with one chunk of lines
+    removed. All candidates at a given granularity are run in parallel and
+    the first one that still fails the same way is kept."""
+
+    def __init__(self, workdir, jobs, timeout, expected):
+        self.workdir = workdir
+        self.jobs = jobs
+        self.timeout = timeout
+        self.expected = expected
+        self.count = 0
+
+    def write(self, lines):
+        self.count += 1
+        path = os.path.join(self.workdir, f"cand_{self.count}.f32")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def first_failing(self, candidates):
+        """Return the first candidate (a list of lines) that reproduces the failure, or None."""
+        paths = [self.write(c) for c in candidates]
+        found = None
+        for (path, status, _, _), lines in zip(regress.iter_results(paths, self.jobs, timeout=self.timeout),
+                                               candidates):
+            if found is None and status == self.expected:
+                found = lines
+        for path in paths:
+            os.remove(path)
+        return found
+
+    def minimize(self, lines):
+        n = 2
+        while len(lines) >= 2:
+            size = -(-len(lines) // n)
+            chunks = [(i, min(i + size, len(lines))) for i in range(0, len(lines), size)]
+            candidates = [lines[:a] + lines[b:] for a, b in chunks]
+            reduced = self.first_failing(candidates)
+            if reduced is not None:
+                lines = reduced
+                n = max(n - 1, 2)
+                print(f"  {len(lines)} lines")
+            elif n >= len(lines):
+                break
+            else:
+                n = min(n * 2, len(lines))
+        return lines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reduce a failing test program to a minimal reproducer.")
+    parser.add_argument("test_file", help="Failing .f32 program.")
+    parser.add_argument("-o", "--output", help="Output file (default <test>.min.f32).")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="Parallel jobs (0 = one per core).")
+    parser.add_argument("--timeout", type=float, default=120, help="Per-candidate time limit in seconds.")
+    parser.add_argument("-C", "--context", type=int, default=3,
+                        help="Number of matching events to show before the divergence.")
+    args = parser.parse_args()
+
+    if regress.build.build() != 0:
+        sys.exit(1)
+
+    jobs = args.jobs or os.cpu_count()
+    output = args.output or os.path.splitext(args.test_file)[0] + ".min.f32"
+    with open(args.test_file) as f:
+        lines = strip_source(f.readlines())
+
+    workdir = tempfile.mkdtemp(prefix="minimize_", dir=".")
+    try:
+        # Always use the process pool so every candidate runs in its own sandbox
+        minimizer = Minimizer(workdir, max(jobs, 2), args.timeout, None)
+        [(_, expected, _, _)] = regress.iter_results([minimizer.write(lines)], 2, timeout=args.timeout)
+        if expected not in DIVERGENCES:
+            print(f"{args.test_file}: {expected}, not an RTL/emulator divergence - nothing to minimise")
+            sys.exit(1)
+        print(f"{args.test_file}: {expected}, {len(lines)} lines")
+
+        minimizer.expected = expected
+        lines = minimizer.minimize(lines)
+        with open(output, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"Wrote {len(lines)} line reproducer to {output}")
+
+        # Rerun the reproducer to show its first divergence
+        sandbox = regress.make_sandbox(output, workdir)
+        status, _, _ = regress.run_simulation(output, verbose=True, workdir=sandbox,
+                                              context=args.context, timeout=args.timeout)
+        regress.report(output, status)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
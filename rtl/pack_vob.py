@@ -1,14 +1,89 @@
-import struct
 import re
+import argparse
+import numpy as np
 
 FIX_SCALE = 1 << 12
 
+# 64-byte VOB record. 12.12 fixed-point fields are 24 bits, stored as three
+# little-endian bytes.
+VOB_DTYPE = np.dtype({
+    "names":   ["ystart", "yend", "xclip1", "xclip2", "brk_y", "ctrl", "src_stride",
+                "x1", "x2", "z", "u", "v",
+                "src_addr", "dzdx", "dudx", "dvdx", "brk_dxdy",
+                "dx1dy", "dx2dy", "dzdy", "dudy", "dvdy"],
+    "formats": ["<u2"] * 6 + ["<u4"] + [("u1", 3)] * 5 + ["<u4"] + [("u1", 3)] * 4 + [("u1", 3)] * 5,
+    "offsets": [0x00, 0x02, 0x04, 0x06, 0x08, 0x0A, 0x0C,
+                0x10, 0x13, 0x16, 0x19, 0x1C,
+                0x20, 0x24, 0x27, 0x2A, 0x2D,
+                0x30, 0x33, 0x36, 0x39, 0x3C],
+    "itemsize": 64,
+})
+
+INT16_FIELDS = ["ystart", "yend", "xclip1", "xclip2", "brk_y", "ctrl"]
+INT32_FIELDS = ["src_stride", "src_addr"]
+FIX_FIELDS = ["x1", "x2", "z", "u", "v", "dzdx", "dudx", "dvdx", "brk_dxdy",
+              "dx1dy", "dx2dy", "dzdy", "dudy", "dvdy"]
+
 def to_fix12_12(x):
     v = int(round(float(x) * FIX_SCALE))
     if v < -0x800000 or v > 0x7FFFFF:
         raise ValueError(f"12.12 overflow: {x}")
     return v & 0xFFFFFF
 
+def fix12_12_array(values, name="value"):
+    """Vectorised to_fix12_12: convert an array to 24-bit two's complement 12.12."""
+    fixed = np.round(np.asarray(values, dtype=np.float64) * FIX_SCALE).astype(np.int64)
+    bad = (fixed < -0x800000) | (fixed > 0x7FFFFF)
+    if bad.any():
+        i = int(np.argmax(bad))
+        raise ValueError(f"12.12 overflow: {name} = {np.asarray(values).flat[i]} (VOB {i})")
+    return (fixed & 0xFFFFFF).astype(np.uint32)
+
+def check_int_range(values, lo, hi, name):
+    values = np.asarray(values, dtype=np.int64)
+    bad = (values < lo) | (values > hi)
+    if bad.any():
+        i = int(np.argmax(bad))
+        raise ValueError(f"{name} = {values.flat[i]} out of range (VOB {i})")
+    return values
+
+def pack_vobs(fields):
+    """Pack VOBs given as a dict of field name -> array (one entry per VOB).
+
+    Fixed-point fields are real numbers and are converted to 12.12 in one
+    vectorised pass per field. 16-bit fields may be signed or unsigned.
+    Returns a structured array of VOB_DTYPE records."""
+    n = len(np.atleast_1d(fields["ystart"]))
+    recs = np.zeros(n, dtype=VOB_DTYPE)
+    for name in INT16_FIELDS:
+        recs[name] = check_int_range(fields[name], -0x8000, 0xFFFF, name) & 0xFFFF
+    for name in INT32_FIELDS:
+        recs[name] = check_int_range(fields[name], -0x80000000, 0xFFFFFFFF, name) & 0xFFFFFFFF
+    for name in FIX_FIELDS:
+        fixed = np.broadcast_to(fix12_12_array(fields[name], name), (n,))
+        recs[name] = fixed.astype("<u4").view("u1").reshape(n, 4)[:, :3]
+    return recs
+
+def unpack_vobs(recs):
+    """Inverse of pack_vobs: return a dict of field name -> int64 array, with the
+    12.12 fields as sign-extended raw fixed-point values (divide by FIX_SCALE
+    for real numbers)."""
+    fields = {name: recs[name].astype(np.int64) for name in INT16_FIELDS + INT32_FIELDS}
+    for name in FIX_FIELDS:
+        b = recs[name].astype(np.int64)
+        raw = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        fields[name] = raw - ((raw & 0x800000) << 1)
+    return fields
+
+def vobs_to_fields(vobs):
+    """Convert VOBs parsed from vobs.txt (dicts of strings) into the field arrays pack_vobs takes."""
+    fields = {}
+    for name in INT16_FIELDS + INT32_FIELDS:
+        fields[name] = np.array([int(v[name], 0) for v in vobs], dtype=np.int64)
+    for name in FIX_FIELDS:
+        fields[name] = np.array([float(v[name]) for v in vobs], dtype=np.float64)
+    return fields
+
 def parse_vobs(filename):
     vobs = []
     cur = None
@@ -35,62 +110,35 @@ def parse_vobs(filename):
     return vobs
 
 def pack_vob(v):
-    out = bytearray(64)
-
-    def w16(ofs, val):
-        struct.pack_into("<H", out, ofs, int(val) & 0xFFFF)
-
-    def w32(ofs, val):
-        struct.pack_into("<I", out, ofs, int(val) & 0xFFFFFFFF)
-
-    def w24(ofs, val):
-        out[ofs+2] = (val >> 16) & 0xFF
-        out[ofs+1] = (val >> 8)  & 0xFF
-        out[ofs+0] = val & 0xFF
-
-    # --- Block 0 ---
-    w16(0x00, v["ystart"])
-    w16(0x02, v["yend"])
-    w16(0x04, v["xclip1"])
-    w16(0x06, v["xclip2"])
-    w16(0x08, v["brk_y"])
-    w16(0x0A, int(v["ctrl"], 0))
-    w32(0x0C, int(v["src_stride"], 0))
-
-    # --- Block 1 ---
-    w24(0x10, to_fix12_12(v["x1"]))
-    w24(0x13, to_fix12_12(v["x2"]))
-    w24(0x16, to_fix12_12(v["z"]))
-    w24(0x19, to_fix12_12(v["u"]))
-    w24(0x1C, to_fix12_12(v["v"]))
-    out[0x1F] = 0
-
-    # --- Block 2 ---
-    w32(0x20, int(v["src_addr"], 0))
-    w24(0x24, to_fix12_12(v["dzdx"]))
-    w24(0x27, to_fix12_12(v["dudx"]))
-    w24(0x2A, to_fix12_12(v["dvdx"]))
-    w24(0x2D, to_fix12_12(v["brk_dxdy"]))
-
-    # --- Block 3 ---
-    w24(0x30, to_fix12_12(v["dx1dy"]))
-    w24(0x33, to_fix12_12(v["dx2dy"]))
-    w24(0x36, to_fix12_12(v["dzdy"]))
-    w24(0x39, to_fix12_12(v["dudy"]))
-    w24(0x3C, to_fix12_12(v["dvdy"]))
-    out[0x3F] = 0
-
-    return out
+    """Pack a single VOB (a dict of strings as from parse_vobs) into 64 bytes."""
+    return bytearray(pack_vobs(vobs_to_fields([v])).tobytes())
+
+def write_hex(recs, filename):
+    """Write packed VOBs as 32-bit little-endian words, one hex word per line."""
+    words = np.frombuffer(np.ascontiguousarray(recs).tobytes(), dtype="<u4")
+    # Format all words at once: eight hex digits from a lookup table, then a newline
+    digits = (words[:, None] >> np.arange(28, -1, -4, dtype=np.uint32)) & 0xF
+    text = np.empty((len(words), 9), dtype=np.uint8)
+    text[:, :8] = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)[digits]
+    text[:, 8] = ord("\n")
+    with open(filename, "wb") as f:
+        f.write(text.tobytes())
+
+def write_bin(recs, filename):
+    np.ascontiguousarray(recs).tofile(filename)
 
 def dump_hex_words(vobs, filename):
-    with open(filename, "w") as f:
-        for blob in vobs:
-            for i in range(0, 64, 4):
-                w = struct.unpack("I", blob[i:i+4])[0]
-                f.write(f"{w:08X}\n")
+    """Write a list of 64-byte VOBs from pack_vob as a hex word image."""
+    write_hex(np.frombuffer(b"".join(vobs), dtype=VOB_DTYPE), filename)
 
 if __name__ == "__main__":
-    vobs = parse_vobs("vobs.txt")
-    blobs = [pack_vob(v) for v in vobs]
-    dump_hex_words(blobs, "vob_image.hex")
-    print(f"Wrote {len(blobs)} VOBs")
+    parser = argparse.ArgumentParser(description="Pack VOB descriptions into a blitter VOB image.")
+    parser.add_argument("infile", nargs="?", default="vobs.txt")
+    parser.add_argument("--hex", default="vob_image.hex", help="Hex word image")
+    parser.add_argument("--bin", default="vob_image.bin", help="Raw binary image")
+    args = parser.parse_args()
+
+    recs = pack_vobs(vobs_to_fields(parse_vobs(args.infile)))
+    write_hex(recs, args.hex)
+    write_bin(recs, args.bin)
+    print(f"Wrote {len(recs)} VOBs")
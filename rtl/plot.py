@@ -1,27 +1,115 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import sys
+import argparse
 
-# usage: python plot_file.py data.txt
-if len(sys.argv) < 2:
-    print("Usage: python plot_file.py <filename>")
-    sys.exit(1)
+# Plot columns of space-separated numbers (e.g. i2s_samples.txt), one row per
+# line. Long files are reduced to a min/max envelope of about --points bins,
+# which looks the same as plotting every row at screen resolution, and the
+# envelope is recomputed for the visible range when zooming.
 
-filename = sys.argv[1]
+CHUNK_BYTES = 16 << 20          # Text parsed per block
+DEFAULT_POINTS = 2000
 
-# Load space-separated numeric data
-data = np.loadtxt(filename)
+def load_columns(filename, start=0, end=None):
+    """Load rows [start, end) of a numeric text file into a (rows, columns) array.
 
-# X-axis is just the row index
-x = np.arange(data.shape[0])
+    The file is read in blocks. Blocks that end before start are only
+    counted, not parsed, so the cost of a zoomed-in load grows with end
+    rather than the file size."""
+    blocks = []
+    columns = None
+    row = 0
+    carry = b""
+    with open(filename, "rb") as f:
+        while end is None or row < end:
+            block = f.read(CHUNK_BYTES)
+            text = carry + block
+            cut = text.rfind(b"\n") + 1 if block else len(text)
+            text, carry = text[:cut], text[cut:]
+            if not text:
+                break
+            lines = text.count(b"\n") + (0 if text.endswith(b"\n") else 1)
+            if row + lines <= start:
+                row += lines
+                continue
+            if columns is None:
+                columns = len(text.split(b"\n", 1)[0].split())
+            values = np.fromstring(text.decode("ascii"), dtype=np.float64, sep=" ")
+            data = values.reshape(-1, columns)
+            lo = max(start - row, 0)
+            hi = len(data) if end is None else min(end - row, len(data))
+            blocks.append(data[lo:hi])
+            row += len(data)
+    if not blocks:
+        return np.zeros((0, columns or 1))
+    return np.concatenate(blocks)
 
-# Plot each column
-for i in range(data.shape[1]):
-    plt.plot(x, data[:, i], label=f'Column {i+1}')
+def envelope(data, points=DEFAULT_POINTS):
+    """Reduce an array of rows to per-bin minimum and maximum.
 
-plt.xlabel('Row index')
-plt.ylabel('Values')
-plt.title(f'Plot of {filename}')
-plt.legend()
-plt.grid(True)
-plt.show()
+    Returns (x, y) where x has two entries per bin (the bin's first row index,
+    repeated) and y the bin's min and max for each column, so plotting y
+    against x draws the vertical extent of every bin. Data with no more rows
+    than 2 * points is returned unchanged."""
+    n = len(data)
+    if n <= 2 * points:
+        return np.arange(n), data
+    size = -(-n // points)
+    bins = -(-n // size)
+    pad = bins * size - n
+    if pad:
+        # Repeat the last row so the final partial bin does not pick up padding values
+        data = np.concatenate([data, np.repeat(data[-1:], pad, axis=0)])
+    shaped = data.reshape(bins, size, -1)
+    y = np.empty((bins, 2, data.shape[1]))
+    y[:, 0] = shaped.min(axis=1)
+    y[:, 1] = shaped.max(axis=1)
+    x = np.repeat(np.arange(bins) * size, 2)
+    return x, y.reshape(bins * 2, -1)
+
+class EnvelopePlot:
+    """Plot the envelope of a data range and recompute it from the loaded rows on zoom."""
+
+    def __init__(self, ax, data, offset=0, points=DEFAULT_POINTS):
+        self.ax = ax
+        self.data = data
+        self.offset = offset
+        self.points = points
+        x, y = envelope(data, points)
+        self.lines = [ax.plot(x + offset, y[:, i], label=f"Column {i + 1}")[0] for i in range(data.shape[1])]
+        ax.callbacks.connect("xlim_changed", self.on_zoom)
+
+    def on_zoom(self, ax):
+        lo, hi = ax.get_xlim()
+        lo = max(int(lo) - self.offset, 0)
+        hi = min(int(np.ceil(hi)) - self.offset + 1, len(self.data))
+        if hi <= lo:
+            return
+        x, y = envelope(self.data[lo:hi], self.points)
+        for i, line in enumerate(self.lines):
+            line.set_data(x + lo + self.offset, y[:, i])
+        ax.figure.canvas.draw_idle()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot the columns of a numeric text file against row index.")
+    parser.add_argument("filename")
+    parser.add_argument("--start", type=int, default=0, help="First row to plot")
+    parser.add_argument("--end", type=int, help="Row to stop before (default: end of file)")
+    parser.add_argument("--points", type=int, default=DEFAULT_POINTS,
+                        help="Number of min/max bins drawn (about the plot width in pixels)")
+    parser.add_argument("-o", "--output", help="Save the plot to this file instead of showing it")
+    args = parser.parse_args()
+
+    data = load_columns(args.filename, args.start, args.end)
+
+    fig, ax = plt.subplots()
+    plot = EnvelopePlot(ax, data, args.start, args.points)
+    ax.set_xlabel('Row index')
+    ax.set_ylabel('Values')
+    ax.set_title(f'Plot of {args.filename}')
+    ax.legend()
+    ax.grid(True)
+    if args.output:
+        fig.savefig(args.output)
+    else:
+        plt.show()
@@ -1,8 +1,21 @@
 import os
+import sys
+import shutil
+import json
+import hashlib
+import time
+import tempfile
 import subprocess
 import re
 import argparse
-from collections import defaultdict
+import xml.etree.ElementTree as ET
+from collections import deque
+from itertools import zip_longest
+from concurrent.futures import ProcessPoolExecutor
+
+import build
+import bench
+import blit_model
 
 # Color escape codes
 RED = "\033[1;31m"
@@ -12,87 +25,497 @@ RESET = "\033[0m"
 # Regex for register writes
 line_re = re.compile(r"\$\s*(\d+)\s*=\s*([0-9a-fA-F]+)")
 
-def parse_writes(filename):
-    """Parse a register write log into {reg: [values in order]}"""
-    reg_writes = defaultdict(list)
+# Regex for memory stores: [addr]=value byte_mask
+mem_re = re.compile(r"\[([0-9a-fA-F]+)\]\s*=\s*([0-9a-fA-F]+)\s+([0-9a-fA-F]+)")
+
+# Input files the RTL and emulator read from their working directory
+SANDBOX_FILES = ["palette.hex", "uart_input.hex", "blit_cpu_rom.hex"]
+
+# External tools whose binaries are part of the result cache key
+TOOLS = ["f32asm.exe", "vvp.exe", "f32sim.exe"]
+
+# Persistent result cache (see ResultCache)
+CACHE_FILE = ".regress_cache.json"
+
+# Directories polled by --watch
+WATCH_DIRS = ["src", "testcases"]
+
+def iter_writes(filename):
+    """Yield (reg, value, line) for each register write in a log, in file order."""
     with open(filename) as f:
         for line in f:
             m = line_re.search(line)
             if m:
-                reg = int(m.group(1))
-                val = int(m.group(2), 16)
-                reg_writes[reg].append(val)
-    return reg_writes
-
-def compare_traces(golden_file, rtl_file, verbose=True):
-    """Compare two register write logs."""
-    golden = parse_writes(golden_file)
-    rtl = parse_writes(rtl_file)
-
-    all_regs = sorted(set(golden.keys()) | set(rtl.keys()))
-    mismatches = []
-
-    for r in all_regs:
-        g_seq = golden.get(r, [])
-        r_seq = rtl.get(r, [])
-        if g_seq != r_seq:
-            mismatches.append((r, g_seq, r_seq))
-            if verbose:
-                print(f"  Register ${r}:")
-                print(f"    Golden: {[f'0x{v:08x}' for v in g_seq]}")
-                print(f"    RTL:    {[f'0x{v:08x}' for v in r_seq]}")
-
-    return mismatches
-
-def run_simulation(test_file, verbose):
-    """Run assembler, RTL simulation, and CPU emulator for a test file."""
+                yield int(m.group(1)), int(m.group(2), 16), line.rstrip()
+
+def iter_stores(filename):
+    """Yield (word_addr, (mask, value), line) for each memory store in a log.
+
+    Only the bytes selected by the mask are significant, so the value is
+    masked before comparison."""
+    with open(filename) as f:
+        for line in f:
+            m = mem_re.search(line)
+            if m:
+                addr = int(m.group(1), 16)
+                mask = int(m.group(3), 16)
+                lanes = sum(0xff << (8 * i) for i in range(4) if mask & (1 << i))
+                yield addr & ~3, (mask, int(m.group(2), 16) & lanes), line.rstrip()
+
+def iter_uart(filename, blocksize=1 << 16):
+    """Yield ("uart", byte, description) for each byte written to the UART."""
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            for b in block:
+                yield "uart", b, f"{b:02x} {chr(b)!r}"
+
+# Comparison channels: name -> (emulator log, RTL log, event reader, what each event is)
+CHANNELS = {
+    "reg":  ("sim_reg.log",  "rtl_reg.log",  iter_writes, "write"),
+    "mem":  ("sim_mem.log",  "rtl_mem.log",  iter_stores, "store"),
+    "uart": ("sim_uart.log", "rtl_uart.log", iter_uart,   "byte"),
+    "blit": (blit_model.MODEL_TRACE, blit_model.RTL_TRACE, blit_model.iter_trace, "write"),
+}
+DEFAULT_CHANNELS = ("reg", "mem", "uart")
+
+def first_divergence(golden, rtl, context=3):
+    """Walk two event streams in lockstep and stop at the first difference.
+
+    Each stream yields (key, value, line) tuples. Returns None if the streams
+    are identical, otherwise (index, golden_event, rtl_event, history) where an
+    event is None if that stream ended early and history holds the last
+    `context` matching lines."""
+    history = deque(maxlen=context)
+    for index, (g, r) in enumerate(zip_longest(golden, rtl)):
+        if g is None or r is None or g[:2] != r[:2]:
+            return index, g, r, list(history)
+        if context:
+            history.append(g[2])
+    return None
+
+def print_divergence(div, what="write", golden_name="Golden", rtl_name="RTL"):
+    index, g, r, history = div
+    print(f"  First divergence at {what} #{index}:")
+    for line in history:
+        print(f"              {line}")
+    print(f"    {golden_name:8}: {g[2] if g else '<end of trace>'}")
+    print(f"    {rtl_name:8}: {r[2] if r else '<end of trace>'}")
+
+def compare_traces(golden_file, rtl_file, verbose=True, context=3):
+    """Compare two register write logs in write order.
+
+    Both files are streamed, so memory use is constant and the comparison ends
+    at the first mismatch. Returns the divergence (see first_divergence) or None."""
+    div = first_divergence(iter_writes(golden_file), iter_writes(rtl_file), context)
+    if div and verbose:
+        print_divergence(div)
+    return div
+
+def compare_channel(channel, workdir=".", verbose=True, context=3):
+    """Stream the emulator and RTL logs of one channel through first_divergence.
+
+    A channel whose RTL log was never written (e.g. the blitter is not in the
+    build) is skipped; a missing emulator log counts as a divergence."""
+    golden_log, rtl_log, reader, what = CHANNELS[channel]
+    golden_file = os.path.join(workdir, golden_log)
+    rtl_file = os.path.join(workdir, rtl_log)
+    if not os.path.exists(rtl_file):
+        if verbose:
+            print(f"  Channel {channel}: {rtl_file} not found, skipped")
+        return None
+    if not os.path.exists(golden_file):
+        if verbose:
+            print(f"  Channel {channel}: {golden_file} not found")
+        return 0, None, None, []
+    div = first_divergence(reader(golden_file), reader(rtl_file), context)
+    if div and verbose:
+        print(f"  Channel {channel}:")
+        print_divergence(div, what)
+    return div
+
+def make_sandbox(test_file, root):
+    """Create a scratch directory for one test, populated with the simulator input files."""
     base_name = os.path.splitext(os.path.basename(test_file))[0]
+    workdir = os.path.join(root, base_name)
+    os.makedirs(workdir, exist_ok=True)
+    for name in SANDBOX_FILES:
+        if os.path.exists(name):
+            shutil.copy(name, workdir)
+    return workdir
+
+def run_simulation(test_file, verbose, workdir=".", rtl_image="a.out", context=3,
+                   channels=DEFAULT_CHANNELS, timeout=None, deadline=None):
+    """Run assembler, RTL simulation, and CPU emulator for a test file.
+
+    All output files are written into workdir. The test is killed once it
+    has run for `timeout` seconds or the global `deadline` (a time.time()
+    value) has passed. Returns (status, phases, perf) where status is one of
+    PASS, FAIL (register mismatch), FAIL MEM, FAIL UART, FAIL BLIT, FAIL VGA,
+    FAIL ASM, FAIL RTL, FAIL SIM or TIMEOUT, phases maps each phase that ran to its wall time and
+    perf holds the RTL performance counters (None if the test never stopped them)."""
+    test_file = os.path.abspath(test_file)
+    rtl_image = os.path.abspath(rtl_image)
+    phases = {}
+    if timeout is not None:
+        deadline = min(deadline or float("inf"), time.time() + timeout)
+
+    def run_phase(name, command, log_name=None):
+        """Run one tool, recording its wall time. Returns its exit status, or None on timeout."""
+        left = None if deadline is None else deadline - time.time()
+        if left is not None and left <= 0:
+            return None
+        if log_name:
+            out = open(os.path.join(workdir, log_name), "w")
+        else:
+            out = subprocess.DEVNULL if workdir != "." else None
+        start = time.perf_counter()
+        try:
+            return subprocess.run(command, cwd=workdir, stdout=out,
+                                  stderr=subprocess.STDOUT if log_name else None, timeout=left).returncode
+        except subprocess.TimeoutExpired:
+            return None
+        finally:
+            phases[name] = time.perf_counter() - start
+            if log_name:
+                out.close()
 
     # Run assembler
-    result = subprocess.run(["f32asm.exe", test_file])
-    if result.returncode != 0:
-        print(f"{test_file} {RED}FAIL ASM{RESET}")
-        return False
+    rc = run_phase("asm", ["f32asm.exe", test_file])
+    if rc != 0:
+        return ("TIMEOUT" if rc is None else "FAIL ASM"), phases, None
 
     # Run RTL simulation
-    vvplog = open("vvp.log","w")
-    try:
-        subprocess.run(["vvp.exe", "a.out"], check=True, stdout=vvplog, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError:
-        print(f"{test_file} {RED}FAIL RTL{RESET}")
-        return False
+    rc = run_phase("rtl", ["vvp.exe", rtl_image], "vvp.log")
+    if rc != 0:
+        return ("TIMEOUT" if rc is None else "FAIL RTL"), phases, None
+    perf = bench.read_perf(workdir)
 
     # Run CPU emulation
-    simlog = open("sim.log","w")
-    try:
-        subprocess.run(["f32sim.exe", "asm.hex"], check=True, stdout=simlog, stderr=subprocess.STDOUT)
-    except subprocess.CalledProcessError:
-        print(f"{test_file} {RED}FAIL SIM{RESET}")
-        return False
-
-    # Compare logs
-    mismatches = compare_traces("sim_reg.log", "rtl_reg.log", verbose)
-    if mismatches:
-        print(f"{test_file} {RED}FAIL{RESET}")
-        return False
-    else:
-        print(f"{test_file} {GREEN}PASS{RESET}")
+    rc = run_phase("sim", ["f32sim.exe", "asm.hex"], "sim.log")
+    if rc != 0:
+        return ("TIMEOUT" if rc is None else "FAIL SIM"), phases, perf
+
+    # Compare logs, stopping at the first channel that diverges
+    start = time.perf_counter()
+    if "blit" in channels and os.path.exists(os.path.join(workdir, blit_model.RTL_TRACE)):
+        # The emulator has no blitter, so the reference trace comes from the microcode model
+        blit_model.generate(workdir)
+    status = "PASS"
+    for channel in channels:
+        if channel in CHANNELS and compare_channel(channel, workdir, verbose, context):
+            status = "FAIL" if channel == "reg" else f"FAIL {channel.upper()}"
+            break
+    if status == "PASS" and "vga" in channels and not check_vga(test_file, workdir, verbose):
+        status = "FAIL VGA"
+    phases["compare"] = time.perf_counter() - start
+    return status, phases, perf
+
+def check_vga(test_file, workdir=".", verbose=True):
+    """Compare the last complete VGA frame against the test's golden image, if it has one.
+
+    A heatmap of the differences is left in vga_diff.png in workdir."""
+    import vga_compare          # Needs numpy and Pillow, so only loaded for --vga
+    golden = vga_compare.golden_image(test_file)
+    if not os.path.exists(golden):
         return True
+    dump = os.path.join(workdir, vga_compare.DUMP_FILE)
+    try:
+        ok, count = vga_compare.check_dump(dump, golden, diff_file=os.path.join(workdir, "vga_diff.png"))
+        message = f"{count} pixels differ from {golden}"
+    except (OSError, ValueError, IndexError) as e:
+        # IndexError: the dump has pixels outside the golden image
+        ok, message = False, f"{dump}: {e}"
+    if not ok and verbose:
+        print(f"  VGA: {message}")
+    return ok
+
+def report(test_file, status, note=""):
+    """Print the coloured result line for one test."""
+    color = GREEN if status == "PASS" else RED
+    print(f"{test_file} {color}{status}{RESET} {note}".rstrip())
+
+def run_sandboxed(test_file, root, **kwargs):
+    """Process pool entry point: run one test in its own scratch directory."""
+    workdir = make_sandbox(test_file, root)
+    return run_simulation(test_file, verbose=False, workdir=workdir, **kwargs)
+
+def iter_results(test_files, jobs=1, keep=False, **kwargs):
+    """Run tests and yield (test_file, status, phases, perf) in test order.
+
+    With jobs == 1 tests run one after another in the current directory;
+    otherwise they run across a process pool, each in its own scratch directory.
+    Extra keyword arguments are passed on to run_simulation."""
+    if jobs == 1:
+        for test_file in test_files:
+            yield (test_file,) + run_simulation(test_file, verbose=False, **kwargs)
+        return
+
+    root = tempfile.mkdtemp(prefix="regress_", dir=".")
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(run_sandboxed, t, root, **kwargs) for t in test_files]
+            for test_file, future in zip(test_files, futures):
+                yield (test_file,) + future.result()
+    finally:
+        if keep:
+            print(f"Test outputs kept in {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+def hash_files(paths, h=None):
+    """SHA-256 over the names and contents of a list of files (missing files hash as absent)."""
+    h = h or hashlib.sha256()
+    for path in paths:
+        h.update(str(path).encode())
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        else:
+            h.update(b"<missing>")
+    return h
+
+class ResultCache:
+    """Persistent map of test file -> (content hash, status).
+
+    The hash covers the test source, the compiled RTL image, the simulator
+    input files, the f32asm/f32sim binaries and the set of compared channels,
+    so a cached result is only reused when nothing that could change it has
+    changed."""
+
+    def __init__(self, filename=CACHE_FILE, rtl_image="a.out", channels=DEFAULT_CHANNELS):
+        self.filename = filename
+        self.rtl_image = rtl_image
+        self.channels = channels
+        self.entries = {}
+        if os.path.exists(filename):
+            try:
+                with open(filename) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"Warning: ignoring unreadable cache {filename}")
+        self.refresh()
+
+    def refresh(self):
+        """Recompute the hash of everything except the test source, e.g. after a rebuild."""
+        tools = [shutil.which(t) for t in TOOLS]
+        h = hashlib.sha256(",".join(self.channels).encode())
+        self.env_hash = hash_files([self.rtl_image] + SANDBOX_FILES + tools, h).hexdigest()
+
+    def key(self, test_file):
+        h = hashlib.sha256(self.env_hash.encode())
+        paths = [test_file]
+        if "vga" in self.channels:
+            import vga_compare
+            paths.append(vga_compare.golden_image(test_file))
+        return hash_files(paths, h).hexdigest()
+
+    def lookup(self, test_file, rerun_failed=False):
+        """Return the cached status for a test, or None if it needs to run."""
+        entry = self.entries.get(test_file)
+        if not entry or entry["key"] != self.key(test_file):
+            return None
+        if rerun_failed and entry["status"] != "PASS":
+            return None
+        return entry["status"]
+
+    def store(self, test_file, status):
+        self.entries[test_file] = {"key": self.key(test_file), "status": status}
+
+    def save(self):
+        tmp = self.filename + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.filename)
+
+def run_suite(test_files, jobs=1, keep=False, cache=None, rerun_failed=False, **kwargs):
+    """Run a list of tests, reusing cached results where possible.
+
+    Results are reported in test order. Returns a list of result records
+    ({"test", "status", "cached", "phases", "time", "perf"}), one per test."""
+    cached = {}
+    if cache:
+        for t in test_files:
+            status = cache.lookup(t, rerun_failed)
+            if status is not None:
+                cached[t] = status
+    to_run = [t for t in test_files if t not in cached]
+    results = iter_results(to_run, jobs, keep, **kwargs)
+
+    records = []
+    for test_file in test_files:
+        if test_file in cached:
+            record = {"test": test_file, "status": cached[test_file], "cached": True,
+                      "phases": {}, "time": 0.0, "perf": None}
+            report(test_file, record["status"], "(cached)")
+        else:
+            _, status, phases, perf = next(results)
+            record = {"test": test_file, "status": status, "cached": False,
+                      "phases": phases, "time": sum(phases.values()), "perf": perf}
+            report(test_file, status, f"({record['time']:.1f}s)")
+            # A timeout depends on the time budget, not just the inputs, so is never cached
+            if cache and status != "TIMEOUT":
+                cache.store(test_file, status)
+                cache.save()
+        records.append(record)
+    return records
+
+def write_json(records, filename):
+    with open(filename, "w") as f:
+        json.dump(records, f, indent=1)
+
+def write_junit(records, filename):
+    """Write results as JUnit XML, with one testcase per test and its phase times as properties."""
+    failures = sum(r["status"] not in ("PASS", "TIMEOUT") for r in records)
+    errors = sum(r["status"] == "TIMEOUT" for r in records)
+    suite = ET.Element("testsuite", name="regress", tests=str(len(records)),
+                       failures=str(failures), errors=str(errors),
+                       time=f"{sum(r['time'] for r in records):.3f}")
+    for r in records:
+        case = ET.SubElement(suite, "testcase", name=os.path.basename(r["test"]),
+                             classname="regress", time=f"{r['time']:.3f}")
+        props = ET.SubElement(case, "properties")
+        ET.SubElement(props, "property", name="cached", value=str(r["cached"]))
+        for phase, t in r["phases"].items():
+            ET.SubElement(props, "property", name=f"time_{phase}", value=f"{t:.3f}")
+        if r["status"] == "TIMEOUT":
+            ET.SubElement(case, "error", message="TIMEOUT")
+        elif r["status"] != "PASS":
+            ET.SubElement(case, "failure", message=r["status"])
+    ET.ElementTree(suite).write(filename, encoding="utf-8", xml_declaration=True)
+
+def list_tests(test_dir="testcases"):
+    return [os.path.join(test_dir, f) for f in sorted(os.listdir(test_dir)) if f.endswith(".f32")]
+
+def snapshot(dirs=WATCH_DIRS):
+    """Map of path -> modification time for every file in the watched directories."""
+    files = {}
+    for d in dirs:
+        for name in os.listdir(d):
+            path = os.path.join(d, name)
+            if os.path.isfile(path):
+                files[path] = os.stat(path).st_mtime_ns
+    return files
+
+def watch(jobs=1, cache=None, interval=0.5, **kwargs):
+    """Poll the RTL sources and testcases and rerun the tests affected by each change.
+
+    A changed testcase reruns just that test; any other change rebuilds the
+    RTL and reruns everything. Changed tests run first, then tests that
+    failed last time, then the rest."""
+    last = snapshot()
+    failed = set()
+    print(f"Watching {', '.join(WATCH_DIRS)} (Ctrl-C to stop)")
+    while True:
+        time.sleep(interval)
+        now = snapshot()
+        if now == last:
+            continue
+        # Let editors finish writing before acting on the change
+        while True:
+            time.sleep(interval)
+            settled = snapshot()
+            if settled == now:
+                break
+            now = settled
+        changed = {f for f in now.keys() | last.keys() if now.get(f) != last.get(f)}
+        last = now
+
+        tests = list_tests()
+        changed_tests = [t for t in tests if t in changed]
+        print(f"\n{time.strftime('%H:%M:%S')} changed: {', '.join(sorted(changed))}")
+        if any(not f.endswith(".f32") for f in changed):
+            if build.build() != 0:
+                print(f"{RED}FAIL BUILD{RESET}")
+                continue
+            affected = tests
+        else:
+            affected = changed_tests
+        if not affected:
+            continue
+
+        order = changed_tests + [t for t in affected if t in failed and t not in changed_tests]
+        order += [t for t in affected if t not in order]
+        if cache:
+            cache.refresh()
+        for r in run_suite(order, jobs, cache=cache, **kwargs):
+            if r["status"] == "PASS":
+                failed.discard(r["test"])
+            else:
+                failed.add(r["test"])
+        print(f"{len(order)} tests run, {len(failed)} failing")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run CPU model regression tests.")
     parser.add_argument("test_file", nargs="?", type=str, help="Path to a specific test case file (.f32).")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of tests to run in parallel, each in its own scratch directory (0 = one per core).")
+    parser.add_argument("--keep", action="store_true", help="Keep the per-test scratch directories.")
+    parser.add_argument("-C", "--context", type=int, default=3,
+                        help="Number of matching events to show before a divergence.")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the result cache.")
+    parser.add_argument("--rerun-failed", action="store_true", help="Rerun tests whose cached result is a failure.")
+    parser.add_argument("--no-build", action="store_true", help="Use the existing a.out without checking it is up to date.")
+    parser.add_argument("--timeout", type=float, help="Per-test time limit in seconds; hung tests are killed and reported as TIMEOUT.")
+    parser.add_argument("--total-timeout", type=float, help="Time limit in seconds for the whole suite.")
+    parser.add_argument("--json", metavar="FILE", help="Write per-test results and phase times as JSON.")
+    parser.add_argument("--junit", metavar="FILE", help="Write per-test results and phase times as JUnit XML.")
+    parser.add_argument("--bench", action="store_true",
+                        help="Report CPI and stall breakdown from the RTL performance counters and record them in the history.")
+    parser.add_argument("--bench-threshold", type=float, default=bench.DEFAULT_THRESHOLD,
+                        help="Percent increase in cycles reported as a benchmark regression.")
+    parser.add_argument("--bench-history", default=bench.HISTORY_FILE, help="Benchmark history file.")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running, rerunning the tests affected by each change to src/ or testcases/.")
+    for channel in DEFAULT_CHANNELS:
+        parser.add_argument(f"--no-{channel}", action="store_true",
+                            help=f"Do not compare the {channel} channel ({CHANNELS[channel][0]} vs {CHANNELS[channel][1]}).")
+    parser.add_argument("--blit", action="store_true",
+                        help="Also compare the blitter microcode trace against the reference model (blit_model.py).")
+    parser.add_argument("--vga", action="store_true",
+                        help="Also compare the last VGA frame against testcases/golden/<test>.png where one exists.")
     args = parser.parse_args()
+    channels = tuple(c for c in DEFAULT_CHANNELS if not getattr(args, f"no_{c}"))
+    if args.blit:
+        channels += ("blit",)
+    if args.vga:
+        channels += ("vga",)
+
+    if not args.no_build and build.build() != 0:
+        print(f"{RED}FAIL BUILD{RESET}")
+        sys.exit(1)
 
-    all_pass = True
+    if args.watch:
+        cache = None if args.no_cache else ResultCache(channels=channels)
+        try:
+            watch(args.jobs or os.cpu_count(), cache, channels=channels, timeout=args.timeout)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    deadline = time.time() + args.total_timeout if args.total_timeout else None
 
     if args.test_file:
-        if not run_simulation(args.test_file, verbose=True):
-            all_pass = False
+        status, phases, perf = run_simulation(args.test_file, verbose=True, context=args.context,
+                                              channels=channels, timeout=args.timeout, deadline=deadline)
+        report(args.test_file, status, " ".join(f"{p}={t:.1f}s" for p, t in phases.items()))
+        records = [{"test": args.test_file, "status": status, "cached": False,
+                    "phases": phases, "time": sum(phases.values()), "perf": perf}]
     else:
-        test_dir = "testcases"
-        for filename in sorted(os.listdir(test_dir)):
-            if filename.endswith(".f32"):
-                test_file = os.path.join(test_dir, filename)
-                if not run_simulation(test_file, verbose=False):
-                    all_pass = False
\ No newline at end of file
+        # Cached results carry no counter values, so benchmarking always reruns
+        cache = None if args.no_cache or args.bench else ResultCache(channels=channels)
+        records = run_suite(list_tests(), args.jobs or os.cpu_count(), args.keep, cache, args.rerun_failed,
+                            channels=channels, timeout=args.timeout, deadline=deadline)
+
+    if args.json:
+        write_json(records, args.json)
+    if args.junit:
+        write_junit(records, args.junit)
+    all_pass = all(r["status"] == "PASS" for r in records)
+
+    if args.bench:
+        results = {r["test"]: bench.metrics(r["perf"]) for r in records if r["perf"] and r["status"] == "PASS"}
+        if bench.report(results, args.bench_history, args.bench_threshold):
+            all_pass = False
+
+    sys.exit(0 if all_pass else 1)
@@ -275,7 +275,7 @@ always_ff @(posedge clock) begin
         
         // synthesis translate_off
         if (rd != 0) 
-            $fwrite(fh, "R%2d=%08h\n", rd, result);
+            $fwrite(fh, "%03h: R%2d=%08h\n", pc, rd, result);
         // synthesis translate_on
     end
 
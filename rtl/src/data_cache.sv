@@ -300,4 +300,16 @@ end
 
 
 
+// synthesis translate_off
+// Log every store committed to memory, in the same format as the emulator's sim_mem.log
+integer fh;
+initial
+   fh = $fopen("rtl_mem.log", "w");
+
+always @(posedge clock) begin
+    if (!reset && state==STATE_READY && cpu_request && !cpu_dcache_abort && cpu_write && dcache_sdram_request==1'b0)
+        $fwrite(fh, "[%08x]=%08x %x\n", cpu_addr, cpu_wdata, cpu_wstrb);
+end
+// synthesis translate_on
+
 endmodule
\ No newline at end of file
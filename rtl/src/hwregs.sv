@@ -134,6 +134,11 @@ logic        prev_key0;
 integer fh;
 initial 
    fh =  $fopen("rtl_uart.log", "w");
+
+// Snapshot of the performance counters each time they are stopped, for the benchmark tooling
+integer perf_fh;
+initial
+   perf_fh = $fopen("rtl_perf.log", "w");
 // synthesis translate_on
 
 always_ff @(posedge clock) begin
@@ -213,6 +218,11 @@ always_ff @(posedge clock) begin
                     perf_reset <= hwregs_wdata[0];
                     perf_run <= hwregs_wdata[1];
                     perf_div_1024 <= hwregs_wdata[2];
+                    // synthesis translate_off
+                    if (perf_run && !hwregs_wdata[1])
+                        $fwrite(perf_fh, "PERF ok=%0d jmp=%0d if=%0d sb=%0d rs=%0d\n",
+                                perf_count_ok, perf_count_jmp, perf_count_if, perf_count_sb, perf_count_rs);
+                    // synthesis translate_on
                 end
             end
             16'h0060: begin
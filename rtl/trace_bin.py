@@ -0,0 +1,138 @@
+import os
+import re
+import sys
+import argparse
+import numpy as np
+
+# Packed binary trace records. No padding, little endian, so a file is just
+# an array of records that can be memory-mapped directly.
+REG_DTYPE = np.dtype([("reg", "u1"), ("value", "<u4")])                    # 5 bytes
+MEM_DTYPE = np.dtype([("addr", "<u4"), ("value", "<u4"), ("mask", "u1")])  # 9 bytes
+
+# Text formats written by the emulator (execute.c) and RTL (cpu_regfile.sv)
+reg_re = re.compile(r"\$\s*(\d+)\s*=\s*([0-9a-fA-F]+)")
+mem_re = re.compile(r"\[([0-9a-fA-F]+)\]\s*=\s*([0-9a-fA-F]+)\s+([0-9a-fA-F]+)")
+
+CHUNK_LINES = 1 << 20        # Lines parsed per block when converting
+CHUNK_RECORDS = 1 << 22      # Records compared per block
+
+def detect_kind(filename):
+    """Guess whether a text log holds register ('reg') or memory ('mem') writes."""
+    with open(filename) as f:
+        for line in f:
+            if mem_re.search(line):
+                return "mem"
+            if reg_re.search(line):
+                return "reg"
+    return "reg"
+
+def convert(text_file, bin_file, kind=None):
+    """Convert a text register/memory log into the packed binary format.
+
+    Returns the number of records written."""
+    kind = kind or detect_kind(text_file)
+    dtype = REG_DTYPE if kind == "reg" else MEM_DTYPE
+    regex = reg_re if kind == "reg" else mem_re
+    count = 0
+
+    with open(text_file) as fin, open(bin_file, "wb") as fout:
+        while True:
+            lines = fin.readlines(CHUNK_LINES * 16)
+            if not lines:
+                break
+            fields = regex.findall("".join(lines))
+            rec = np.empty(len(fields), dtype=dtype)
+            if kind == "reg":
+                rec["reg"] = [int(r) for r, _ in fields]
+                rec["value"] = [int(v, 16) for _, v in fields]
+            else:
+                rec["addr"] = [int(a, 16) for a, _, _ in fields]
+                rec["value"] = [int(v, 16) for _, v, _ in fields]
+                rec["mask"] = [int(m, 16) for _, _, m in fields]
+            rec.tofile(fout)
+            count += len(rec)
+    return count
+
+def load(bin_file, kind="reg"):
+    """Memory-map a binary trace as a structured array."""
+    dtype = REG_DTYPE if kind == "reg" else MEM_DTYPE
+    if os.path.getsize(bin_file) == 0:
+        return np.empty(0, dtype=dtype)      # np.memmap refuses empty files
+    return np.memmap(bin_file, dtype=dtype, mode="r")
+
+def byte_lanes(mask):
+    """Bit mask of the value bytes selected by each store's byte-enable mask."""
+    mask = mask.astype(np.uint32)
+    lanes = np.zeros(len(mask), dtype=np.uint32)
+    for i in range(4):
+        lanes |= np.where(mask & (1 << i), np.uint32(0xff << (8 * i)), np.uint32(0))
+    return lanes
+
+def normalise(rec, kind):
+    """Records in comparable form. For stores only the bytes selected by the
+    mask are significant and the address is taken as a word address, as in
+    regress.iter_stores."""
+    if kind == "reg":
+        return rec
+    out = np.empty(len(rec), dtype=MEM_DTYPE)
+    out["addr"] = rec["addr"] & ~np.uint32(3)
+    out["value"] = rec["value"] & byte_lanes(rec["mask"])
+    out["mask"] = rec["mask"]
+    return out
+
+def first_mismatch(a, b, kind="reg"):
+    """Index of the first record that differs between two traces, or None.
+
+    If one trace is a prefix of the other the index is the length of the
+    shorter one."""
+    n = min(len(a), len(b))
+    for start in range(0, n, CHUNK_RECORDS):
+        end = min(start + CHUNK_RECORDS, n)
+        diff = np.flatnonzero(normalise(a[start:end], kind) != normalise(b[start:end], kind))
+        if len(diff):
+            return start + int(diff[0])
+    return None if len(a) == len(b) else n
+
+def format_record(rec, kind):
+    if rec is None:
+        return "<end of trace>"
+    if kind == "reg":
+        return f"${int(rec['reg']):2d} = {int(rec['value']):08x}"
+    return f"[{int(rec['addr']):08x}]={int(rec['value']):08x} {int(rec['mask']):x}"
+
+def compare(golden_file, rtl_file, kind="reg", context=3, verbose=True):
+    """Compare two binary traces. Returns the first mismatch index or None."""
+    golden = load(golden_file, kind)
+    rtl = load(rtl_file, kind)
+    index = first_mismatch(golden, rtl, kind)
+    if index is not None and verbose:
+        print(f"  First divergence at write #{index}:")
+        for i in range(max(0, index - context), index):
+            print(f"              {format_record(golden[i], kind)}")
+        print(f"    Golden  : {format_record(golden[index] if index < len(golden) else None, kind)}")
+        print(f"    RTL     : {format_record(rtl[index] if index < len(rtl) else None, kind)}")
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert and compare binary register/memory traces.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("convert", help="Convert a text log (sim_reg.log, rtl_reg.log, sim_mem.log) to binary.")
+    p.add_argument("text_file")
+    p.add_argument("bin_file")
+    p.add_argument("--kind", choices=["reg", "mem"], help="Log type (detected if omitted).")
+
+    p = sub.add_parser("compare", help="Compare two binary traces.")
+    p.add_argument("golden_file")
+    p.add_argument("rtl_file")
+    p.add_argument("--kind", choices=["reg", "mem"], default="reg")
+    p.add_argument("-C", "--context", type=int, default=3)
+
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        n = convert(args.text_file, args.bin_file, args.kind)
+        print(f"Wrote {n} records to {args.bin_file}")
+    else:
+        index = compare(args.golden_file, args.rtl_file, args.kind, args.context)
+        sys.exit(0 if index is None else 1)
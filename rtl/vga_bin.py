@@ -0,0 +1,127 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+# Compact binary VGA dump. A 16-byte file header is followed by fixed-size
+# frame records, so a file is just a header and an array of records that can
+# be memory-mapped directly. Each record is a 16-byte frame header followed
+# by either RGB24 pixels or a 256-entry RGB palette and 8-bit indices (the
+# display pipeline is palette-indexed, so a frame rarely needs more).
+MAGIC = b"VGAF"
+VERSION = 1
+MODE_RGB, MODE_INDEXED = 0, 1
+MODES = {"rgb": MODE_RGB, "indexed": MODE_INDEXED}
+EXTENSION = ".vgaf"
+
+HEADER_DTYPE = np.dtype([("magic", "S4"), ("version", "<u2"), ("mode", "u1"), ("reserved", "u1"),
+                         ("width", "<u2"), ("height", "<u2"), ("unused", "u1", 4)])        # 16 bytes
+
+def frame_dtype(width, height, mode):
+    """Record type of one frame: source frame number, palette colours used, then the image."""
+    fields = [("number", "<u4"), ("colors", "<u2"), ("unused", "u1", 10)]
+    if mode == MODE_INDEXED:
+        fields += [("palette", "u1", (256, 3)), ("pixels", "u1", (height, width))]
+    else:
+        fields += [("pixels", "u1", (height, width, 3))]
+    return np.dtype(fields)
+
+def is_vga_bin(filename):
+    try:
+        with open(filename, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def read_header(filename):
+    header = np.fromfile(filename, dtype=HEADER_DTYPE, count=1)
+    if len(header) != 1 or header[0]["magic"] != MAGIC:
+        raise ValueError(f"{filename} is not a binary VGA dump")
+    if header[0]["version"] != VERSION:
+        raise ValueError(f"{filename}: unsupported version {header[0]['version']}")
+    return header[0]
+
+def open_frames(filename):
+    """Memory-map the frame records of a binary dump.
+
+    A record still being written at the end of the file is left out."""
+    header = read_header(filename)
+    dtype = frame_dtype(int(header["width"]), int(header["height"]), int(header["mode"]))
+    count = (os.path.getsize(filename) - HEADER_DTYPE.itemsize) // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)      # np.memmap refuses an empty mapping
+    return np.memmap(filename, dtype=dtype, mode="r", offset=HEADER_DTYPE.itemsize, shape=(count,))
+
+def to_rgb(record):
+    """Return a frame record as an (height, width, 3) RGB array."""
+    if "palette" in record.dtype.names:
+        return record["palette"][record["pixels"]]
+    return np.asarray(record["pixels"])
+
+def index_colors(img):
+    """Split an RGB frame into a 256-entry palette and 8-bit indices.
+
+    Raises ValueError if the frame uses more than 256 colours."""
+    packed = (img[:, :, 0].astype(np.uint32) << 16) | (img[:, :, 1].astype(np.uint32) << 8) | img[:, :, 2]
+    colors, indices = np.unique(packed, return_inverse=True)
+    if len(colors) > 256:
+        raise ValueError(f"frame has {len(colors)} colours, too many for indexed mode (use --rgb)")
+    palette = np.zeros((256, 3), dtype=np.uint8)
+    palette[:len(colors)] = np.stack([colors >> 16, colors >> 8, colors], axis=1).astype(np.uint8)
+    return palette, indices.reshape(img.shape[:2]).astype(np.uint8), len(colors)
+
+def write_frames(frames, filename, mode=MODE_INDEXED):
+    """Write (frame number, RGB array) pairs to a binary dump, one frame at a time.
+
+    The resolution is taken from the first frame. Returns the number of frames written."""
+    count = 0
+    with open(filename, "wb") as f:
+        for number, img in frames:
+            height, width = img.shape[:2]
+            if count == 0:
+                header = np.zeros(1, dtype=HEADER_DTYPE)
+                header[0] = (MAGIC, VERSION, mode, 0, width, height, 0)
+                header.tofile(f)
+                dtype = frame_dtype(width, height, mode)
+            rec = np.zeros(1, dtype=dtype)
+            rec["number"] = number
+            if mode == MODE_INDEXED:
+                rec["palette"][0], rec["pixels"][0], rec["colors"] = index_colors(img)
+            else:
+                rec["pixels"][0] = img
+            rec.tofile(f)
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    import view_vga_dump
+
+    parser = argparse.ArgumentParser(description="Convert a text VGA dump to the compact binary format.")
+    parser.add_argument("infile", help="Text VGA dump (vga_dump.txt)")
+    parser.add_argument("outfile", nargs="?", help=f"Binary dump (default infile with {EXTENSION})")
+    parser.add_argument("--rgb", action="store_true", help="Store RGB24 pixels instead of palette indices")
+    parser.add_argument("--frame", default=":", help="Frame number or range A:B to convert (default all)")
+    parser.add_argument("--size", type=view_vga_dump.parse_size, help="Resolution as WxH, skips the resolution scan")
+    args = parser.parse_args()
+
+    outfile = args.outfile or os.path.splitext(args.infile)[0] + EXTENSION
+    ranges = view_vga_dump.frame_ranges(args.infile)
+    selected = view_vga_dump.parse_frames(args.frame, len(ranges))
+    # Every record has the same size, so frames are decoded at the largest resolution of any of them
+    width, height = args.size or view_vga_dump.dump_size(args.infile, [ranges[n] for n in selected])
+    frames = ((n, np.asarray(im)) for n, im in view_vga_dump.iter_frames(args.infile, selected, width, height))
+    error = None
+    try:
+        n = write_frames(frames, outfile, MODE_RGB if args.rgb else MODE_INDEXED)
+    except ValueError as e:
+        error = str(e)
+    except IndexError:
+        error = f"a frame has pixels outside {width}x{height}"
+    if error:
+        # Don't leave a truncated dump behind
+        if os.path.exists(outfile):
+            os.remove(outfile)
+        print(f"Error: {error}")
+        sys.exit(1)
+    ratio = os.path.getsize(args.infile) / max(os.path.getsize(outfile), 1)
+    print(f"Wrote {n} frames to {outfile} ({ratio:.1f}x smaller)")
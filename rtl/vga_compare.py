@@ -0,0 +1,107 @@
+import os
+import sys
+import argparse
+import numpy as np
+from PIL import Image
+
+import view_vga_dump
+
+DUMP_FILE = "vga_dump.txt"
+
+def golden_image(test_file):
+    """Golden image for regress.py --vga: testcases/golden/<test>.png, compared
+    against the last complete frame of the test's VGA dump."""
+    base = os.path.splitext(os.path.basename(test_file))[0]
+    return os.path.join(os.path.dirname(test_file) or ".", "golden", base + ".png")
+
+def compare_images(actual, golden, tolerance=(0, 0, 0)):
+    """Compare two RGB arrays. Returns a boolean mask of pixels where any channel
+    differs by more than its tolerance, and the per-pixel largest channel difference."""
+    if actual.shape != golden.shape:
+        raise ValueError(f"image size {actual.shape[1]}x{actual.shape[0]} does not match "
+                         f"golden {golden.shape[1]}x{golden.shape[0]}")
+    diff = np.abs(actual.astype(np.int16) - golden.astype(np.int16))
+    bad = (diff > np.asarray(tolerance, dtype=np.int16)).any(axis=2)
+    return bad, diff.max(axis=2)
+
+def heatmap(golden, bad, magnitude):
+    """Diff image: the golden frame dimmed to grey, with differing pixels in red to
+    yellow by how far they are off."""
+    img = np.repeat((golden.mean(axis=2) * 0.3).astype(np.uint8)[:, :, None], 3, axis=2)
+    level = magnitude[bad].astype(np.uint16)
+    img[bad] = np.stack([np.full_like(level, 255), np.minimum(level * 2, 255),
+                         np.zeros_like(level)], axis=1).astype(np.uint8)
+    return img
+
+def check_frame(frame, golden_file, tolerance=(0, 0, 0), max_pixels=0, diff_file=None):
+    """Compare a decoded frame against a golden PNG.
+
+    Returns (ok, number of differing pixels). If the check fails and diff_file
+    is given a heatmap of the differences is written there."""
+    golden = np.asarray(Image.open(golden_file).convert("RGB"))
+    bad, magnitude = compare_images(frame, golden, tolerance)
+    count = int(bad.sum())
+    ok = count <= max_pixels
+    if not ok and diff_file:
+        Image.fromarray(heatmap(golden, bad, magnitude), "RGB").save(diff_file)
+    return ok, count
+
+def check_dump(dump_file, golden_file, frame=None, tolerance=(0, 0, 0), max_pixels=0, diff_file=None,
+               frames=None):
+    """Compare one frame of a text or binary VGA dump (default the last complete
+    one) against a golden PNG."""
+    frames = view_vga_dump.open_frames(dump_file) if frames is None else frames
+    if frame is None:
+        frame = view_vga_dump.last_complete(dump_file, frames)
+    else:
+        frame = view_vga_dump.parse_frames(str(frame), len(frames))[0]
+    golden_size = Image.open(golden_file).size
+    img = view_vga_dump.load_frame(dump_file, frame, *golden_size, frames=frames)
+    return check_frame(img, golden_file, tolerance, max_pixels, diff_file)
+
+def parse_tolerance(text):
+    values = [int(v) for v in text.split(",")]
+    if len(values) == 1:
+        values *= 3
+    if len(values) != 3:
+        raise argparse.ArgumentTypeError("tolerance is one value or R,G,B")
+    return tuple(values)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare VGA dump frames against golden PNG images.")
+    parser.add_argument("infile", help="VGA dump, text (vga_dump.txt) or binary (see vga_bin.py)")
+    parser.add_argument("golden", help="Golden PNG. With a frame range, golden_NNNN.png per frame.")
+    parser.add_argument("--frame", help="Frame number or range A:B (default: the last complete frame)")
+    parser.add_argument("--tolerance", type=parse_tolerance, default=(0, 0, 0),
+                        help="Allowed difference per channel, one value or R,G,B")
+    parser.add_argument("--max-pixels", type=int, default=0, help="Number of differing pixels allowed")
+    parser.add_argument("--diff", help="Write a heatmap of failing frames here (diff_NNNN.png for a range)")
+    parser.add_argument("--update", action="store_true", help="Write the frames as the new golden images")
+    args = parser.parse_args()
+
+    dump = view_vga_dump.open_frames(args.infile)
+    if args.frame is None:
+        frames = [view_vga_dump.last_complete(args.infile, dump)]
+    else:
+        frames = view_vga_dump.parse_frames(args.frame, len(dump))
+    is_range = ":" in (args.frame or "")
+
+    failures = 0
+    for n in frames:
+        golden = view_vga_dump.frame_filename(args.golden, n) if is_range else args.golden
+        diff = args.diff and (view_vga_dump.frame_filename(args.diff, n) if is_range else args.diff)
+        if args.update:
+            img = view_vga_dump.load_frame(args.infile, n, frames=dump)
+            Image.fromarray(img, "RGB").save(golden)
+            print(f"Frame {n}: wrote {golden}")
+            continue
+        if not os.path.exists(golden):
+            print(f"Frame {n}: {golden} not found")
+            failures += 1
+            continue
+        ok, count = check_dump(args.infile, golden, n, args.tolerance, args.max_pixels, diff, dump)
+        note = "" if ok else " - FAIL" + (f", diff in {diff}" if diff else "")
+        print(f"Frame {n}: {count} differing pixels{note}")
+        failures += not ok
+
+    sys.exit(1 if failures else 0)
@@ -1,55 +1,444 @@
+import os
+import re
+import json
+import time
+import zlib
+import struct
+from io import BytesIO
 import numpy as np
 from PIL import Image
-import sys
+import argparse
 
-def load_vga_dump(filename):
-    pixels = []
+import vga_bin
 
-    max_x = 0
-    max_y = 0
+CHUNK_BYTES = 64 << 20          # Text parsed per block
+comment_re = re.compile(rb"#[^\n]*")
 
-    with open(filename) as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("#"):
-                continue
+# tb.sv writes this line at each VSYNC. The frame index is a JSON sidecar
+# (<dump>.idx) holding the byte offset of every marker, so a frame can be
+# decoded by seeking straight to it.
+FRAME_MARKER = b"# New frame\n"
+INDEX_SUFFIX = ".idx"
+INDEX_CHECK_BYTES = 4096        # Tail of the indexed bytes checksummed to spot a rewritten dump
 
-            x, y, r, g, b = map(int, line.split())
-            pixels.append((x, y, r, g, b))
+def iter_pixel_blocks(f, end=None):
+    """Yield (n, 5) int32 arrays of x, y, r, g, b rows from an open binary dump file.
 
-            if x > max_x: max_x = x
-            if y > max_y: max_y = y
+    The text is read in large blocks split on line boundaries, comment lines
+    are removed, and each block is converted with a single np.fromstring
+    call. Reading stops at byte offset end if given."""
+    carry = b""
+    while True:
+        size = CHUNK_BYTES if end is None else min(CHUNK_BYTES, end - f.tell())
+        block = f.read(size) if size > 0 else b""
+        if not block:
+            text = carry
+            carry = b""
+        else:
+            cut = block.rfind(b"\n") + 1
+            text = carry + block[:cut]
+            carry = block[cut:]
+        if text:
+            text = comment_re.sub(b"", text)
+            values = np.fromstring(text.decode("ascii"), dtype=np.int32, sep=" ")
+            if len(values) % 5:
+                raise ValueError("malformed VGA dump: expected 'x y r g b' lines")
+            yield values.reshape(-1, 5)
+        if not block:
+            break
 
-    width  = max_x + 1
-    height = max_y + 1
+def scatter(img, pixels):
+    """Write an (n, 5) pixel block into an image with one fancy-indexing assignment."""
+    img[pixels[:, 1], pixels[:, 0]] = pixels[:, 2:5]
 
+def find_markers(f, start, end):
+    """Return the offsets of frame markers at line starts in bytes [start, end) of f."""
+    markers = []
+    pos = start
+    f.seek(pos)
+    overlap = len(FRAME_MARKER) + 1
+    tail = b""
+    while pos < end:
+        block = f.read(min(CHUNK_BYTES, end - pos))
+        if not block:
+            break
+        data = tail + block
+        base = pos - len(tail)
+        i = data.find(FRAME_MARKER)
+        while i >= 0:
+            at = base + i
+            if (at == 0 or (i > 0 and data[i - 1] == 0x0A)) and (not markers or at > markers[-1]):
+                markers.append(at)
+            i = data.find(FRAME_MARKER, i + 1)
+        # Keep enough to catch a marker and its preceding newline split across blocks
+        tail = data[-overlap:]
+        pos += len(block)
+    return markers
+
+def index_valid(f, index):
+    """Check that a dump still matches its index: every recorded offset holds
+    a frame marker, and the bytes just before the indexed end are unchanged."""
+    for m in index["markers"]:
+        f.seek(m)
+        if f.read(len(FRAME_MARKER)) != FRAME_MARKER:
+            return False
+    start = max(index["size"] - INDEX_CHECK_BYTES, 0)
+    f.seek(start)
+    return zlib.crc32(f.read(index["size"] - start)) == index["check"]
+
+def frame_index(filename):
+    """Return the frame markers of a dump, building or extending its sidecar index.
+
+    The index records the file size it covers. If the dump has grown since
+    (a simulation still running) only the new bytes are scanned; if it has
+    shrunk or no longer matches the index (a new simulation rewrote it) the
+    index is rebuilt."""
+    size = os.path.getsize(filename)
+    index_file = filename + INDEX_SUFFIX
+    empty = {"size": 0, "check": 0, "markers": []}
+    with open(filename, "rb") as f:
+        try:
+            with open(index_file) as fi:
+                index = json.load(fi)
+            if index["size"] > size or not index_valid(f, index):
+                index = empty
+        except (OSError, ValueError, KeyError, TypeError):
+            index = empty
+
+        if index["size"] == size:
+            return index["markers"]
+        start = max(index["size"] - len(FRAME_MARKER) - 1, 0)
+        new = [m for m in find_markers(f, start, size) if not index["markers"] or m > index["markers"][-1]]
+        f.seek(max(size - INDEX_CHECK_BYTES, 0))
+        index = {"size": size, "check": zlib.crc32(f.read()), "markers": index["markers"] + new}
+    try:
+        with open(index_file, "w") as f:
+            json.dump(index, f)
+    except OSError:
+        pass
+    return index["markers"]
+
+def frame_ranges(filename):
+    """Return the (start, end) byte range of each frame's pixel lines.
+
+    Pixels before the first marker (the partial frame before the first
+    VSYNC) form frame 0 if there are any; the last frame runs to the end of
+    the file and may still be incomplete."""
+    markers = frame_index(filename)
+    starts = [0] + [m + len(FRAME_MARKER) for m in markers]
+    ends = markers + [os.path.getsize(filename)]
+    return [(a, b) for a, b in zip(starts, ends) if b > a]
+
+def open_frames(filename):
+    """Return the frames of a text or binary dump as a sequence for load_frame: the
+    byte ranges of a text dump, or the memory-mapped records of a binary one."""
+    if vga_bin.is_vga_bin(filename):
+        return vga_bin.open_frames(filename)
+    return frame_ranges(filename)
+
+def last_complete(filename, frames):
+    """Index of the last complete frame in open_frames(filename). A text frame is
+    complete once the next frame's marker follows it; every record of a binary
+    dump is a whole frame."""
+    if vga_bin.is_vga_bin(filename):
+        n = len(frames) - 1
+    else:
+        markers = set(frame_index(filename))
+        n = max((i for i, (_, end) in enumerate(frames) if end in markers), default=-1)
+    if n < 0:
+        raise ValueError("dump has no complete frame")
+    return n
+
+def parse_frames(spec, count):
+    """Parse a frame selection ("N", "A:B", "A:", ":B", negative counts from the end) into a range."""
+    if ":" not in spec:
+        n = int(spec)
+        n = n + count if n < 0 else n
+        if not 0 <= n < count:
+            raise ValueError(f"frame {spec} out of range, dump has {count} frames")
+        return range(n, n + 1)
+    a, b = spec.split(":", 1)
+    return range(count)[slice(int(a) if a else None, int(b) if b else None)]
+
+def load_vga_dump(filename, width=None, height=None, start=0, end=None):
+    """Load a VGA dump, or the byte range [start, end) of one, into an RGB image array.
+
+    If width and height are given each block is scattered into the image as
+    it is parsed; otherwise the blocks are kept as compact arrays until the
+    resolution has been found from the largest coordinates. A binary dump
+    gives its last frame."""
+    if vga_bin.is_vga_bin(filename):
+        frames = vga_bin.open_frames(filename)
+        return vga_bin.to_rgb(frames[-1]) if len(frames) else np.zeros((0, 0, 3), dtype=np.uint8)
+
+    with open(filename, "rb") as f:
+        f.seek(start)
+        if width and height:
+            img = np.zeros((height, width, 3), dtype=np.uint8)
+            for pixels in iter_pixel_blocks(f, end):
+                scatter(img, pixels)
+            return img
+
+        blocks = [p.astype(np.int16) for p in iter_pixel_blocks(f, end)]
+
+    if not blocks:
+        return np.zeros((0, 0, 3), dtype=np.uint8)
+    width = max(int(p[:, 0].max()) for p in blocks if len(p)) + 1
+    height = max(int(p[:, 1].max()) for p in blocks if len(p)) + 1
     print(f"Detected resolution: {width} x {height}")
 
     img = np.zeros((height, width, 3), dtype=np.uint8)
+    for pixels in blocks:
+        scatter(img, pixels)
+    return img
 
-    for x, y, r, g, b in pixels:
-        img[y, x, 0] = r
-        img[y, x, 1] = g
-        img[y, x, 2] = b
+def dump_size(filename, ranges):
+    """Largest (width, height) over the given byte ranges of a text dump."""
+    width = height = 0
+    with open(filename, "rb") as f:
+        for start, end in ranges:
+            f.seek(start)
+            for pixels in iter_pixel_blocks(f, end):
+                if len(pixels):
+                    width = max(width, int(pixels[:, 0].max()) + 1)
+                    height = max(height, int(pixels[:, 1].max()) + 1)
+    return width, height
 
-    return img
+def load_frame(filename, frame, width=None, height=None, frames=None):
+    """Decode a single frame, seeking directly to it through the frame index.
+
+    frames is the result of open_frames, to save reopening the dump for each frame."""
+    frames = open_frames(filename) if frames is None else frames
+    if vga_bin.is_vga_bin(filename):
+        return vga_bin.to_rgb(frames[frame])
+    start, end = frames[frame]
+    return load_vga_dump(filename, width, height, start, end)
+
+def iter_frames(filename, frames, width=None, height=None, scale=1):
+    """Yield (frame number, PIL image) for each selected frame, decoding one at a time.
+
+    Without an explicit size, the resolution found in the first frame is used
+    for all the others so every image has the same dimensions. scale > 1
+    shrinks each frame by that factor with a box filter."""
+    dump = open_frames(filename)
+    for n in frames:
+        img = load_frame(filename, n, width, height, dump)
+        height, width = img.shape[:2]
+        im = Image.fromarray(img, "RGB")
+        if scale > 1:
+            im = im.reduce(scale)
+        yield n, im
+
+def frame_filename(outfile, frame):
+    stem, ext = os.path.splitext(outfile)
+    return f"{stem}_{frame:04d}{ext}"
+
+def write_numbered(images, outfile):
+    for n, im in images:
+        path = frame_filename(outfile, n)
+        im.save(path)
+        print(f"Saved frame {n} to {path}")
+
+def write_gif(images, outfile, duration):
+    """Write an animated GIF one frame at a time.
+
+    Each frame is encoded on its own by Pillow with an adaptive palette; its
+    global colour table becomes the frame's local table, so only the current
+    frame is ever held in memory."""
+    with open(outfile, "wb") as out:
+        count = 0
+        for n, im in images:
+            buf = BytesIO()
+            im.convert("P", palette=Image.ADAPTIVE).save(buf, "GIF")
+            gif = buf.getvalue()
+            flags = gif[10]
+            pos = 13
+            table = b""
+            if flags & 0x80:
+                table = gif[pos:pos + 3 * (2 << (flags & 7))]
+                pos += len(table)
+            # Skip any extension blocks before the image descriptor
+            while gif[pos] == 0x21:
+                pos += 2
+                while gif[pos]:
+                    pos += gif[pos] + 1
+                pos += 1
+            descriptor = bytearray(gif[pos:pos + 10])
+            if table:
+                descriptor[9] = (descriptor[9] & 0x40) | 0x80 | (flags & 7)
+
+            if count == 0:
+                out.write(b"GIF89a" + struct.pack("<HHBBB", im.width, im.height, 0, 0, 0))
+                out.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")   # Loop forever
+            out.write(b"\x21\xf9\x04\x00" + struct.pack("<H", round(duration / 10)) + b"\x00\x00")
+            out.write(bytes(descriptor) + table + gif[pos + 10:].rstrip(b";"))
+            count += 1
+        out.write(b";")
+    return count
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def write_apng(images, outfile, count, duration):
+    """Write an animated PNG one frame at a time.
+
+    Each frame is compressed by Pillow as a normal PNG and its IDAT data is
+    copied into the animation (as fdAT after the first frame). The frame
+    count goes in the header, so it must be known up front."""
+    seq = 0
+    with open(outfile, "wb") as out:
+        for i, (n, im) in enumerate(images):
+            buf = BytesIO()
+            im.save(buf, "PNG")
+            png = buf.getvalue()
+            pos = 8
+            chunks = []
+            while pos < len(png):
+                length, kind = struct.unpack(">I4s", png[pos:pos + 8])
+                chunks.append((kind, png[pos + 8:pos + 8 + length]))
+                pos += length + 12
+
+            if i == 0:
+                out.write(png[:8])
+                out.write(png_chunk(b"IHDR", dict(chunks)[b"IHDR"]))
+                out.write(png_chunk(b"acTL", struct.pack(">II", count, 0)))
+            out.write(png_chunk(b"fcTL", struct.pack(">IIIIIHHBB", seq, im.width, im.height, 0, 0,
+                                                     round(duration), 1000, 0, 0)))
+            seq += 1
+            for kind, data in chunks:
+                if kind != b"IDAT":
+                    continue
+                if i == 0:
+                    out.write(png_chunk(b"IDAT", data))
+                else:
+                    out.write(png_chunk(b"fdAT", struct.pack(">I", seq) + data))
+                    seq += 1
+        out.write(png_chunk(b"IEND", b""))
+
+def save_latest(img, outfile):
+    """Replace outfile with a frame, via a temporary file so viewers never see a partial PNG."""
+    stem, ext = os.path.splitext(outfile)
+    tmp = f"{stem}.tmp{ext}"
+    Image.fromarray(img, "RGB").save(tmp)
+    os.replace(tmp, outfile)
+
+def follow(filename, outfile, width=None, height=None, interval=0.5):
+    """Tail a dump that a simulation is still writing, saving each frame to outfile as it completes.
+
+    A frame is complete when the marker of the next one arrives. Only the
+    bytes written since the last poll are scanned for markers, and each
+    completed frame is decoded from its own byte range. Runs until interrupted."""
+    while not os.path.exists(filename):
+        time.sleep(interval)
+    if vga_bin.is_vga_bin(filename):
+        return follow_bin(filename, outfile, interval)
+
+    # Catch up with what is already there through the frame index
+    markers = frame_index(filename)
+    complete = [r for r in frame_ranges(filename) if r[1] in set(markers)]
+    frame = len(complete) - 1
+    if complete:
+        img = load_vga_dump(filename, width, height, *complete[-1])
+        height, width = img.shape[:2]
+        save_latest(img, outfile)
+        print(f"Frame {frame} saved to {outfile}")
+    frame_start = markers[-1] + len(FRAME_MARKER) if markers else 0
+    scanned = os.path.getsize(filename)
+
+    while True:
+        size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        if size < scanned:
+            print("Dump was restarted")
+            frame, frame_start, scanned = -1, 0, 0
+        if size > scanned:
+            with open(filename, "rb") as f:
+                new = find_markers(f, max(scanned - len(FRAME_MARKER) - 1, 0), size)
+            for m in new:
+                if m < frame_start:
+                    continue
+                if m > frame_start:
+                    frame += 1
+                    img = load_vga_dump(filename, width, height, frame_start, m)
+                    height, width = img.shape[:2]
+                    save_latest(img, outfile)
+                    print(f"Frame {frame} saved to {outfile}")
+                frame_start = m + len(FRAME_MARKER)
+            scanned = size
+        time.sleep(interval)
+
+def follow_bin(filename, outfile, interval=0.5):
+    """--follow for a binary dump: a frame is complete once its whole record is in the file."""
+    count = 0
+    while True:
+        frames = vga_bin.open_frames(filename)
+        if len(frames) > count:
+            count = len(frames)
+            save_latest(vga_bin.to_rgb(frames[-1]), outfile)
+            print(f"Frame {count - 1} saved to {outfile}")
+        del frames
+        time.sleep(interval)
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python view_vga_dump.py vga_dump.txt [out.png]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="View a VGA dump written by the RTL testbench.")
+    parser.add_argument("infile", help="VGA dump, text (vga_dump.txt) or binary (see vga_bin.py)")
+    parser.add_argument("outfile", nargs="?", help="Save the image to this file")
+    parser.add_argument("--size", type=parse_size, help="Resolution as WxH (e.g. 640x480), skips the resolution scan")
+    parser.add_argument("--frame", help="Frame number or range A:B (default: all frames merged). "
+                                        "A range is saved as an animation if outfile ends in .gif or "
+                                        ".apng, otherwise as outfile_NNNN.png per frame.")
+    parser.add_argument("--step", type=int, default=1, help="Export every Nth frame of a range")
+    parser.add_argument("--scale", type=int, default=1, help="Shrink exported frames by this factor")
+    parser.add_argument("--fps", type=float, default=25, help="Animation frame rate")
+    parser.add_argument("--list", action="store_true", help="Print the number of frames and exit")
+    parser.add_argument("--follow", action="store_true",
+                        help="Keep reading a dump that is still being written, saving each completed "
+                             "frame to outfile (default vga_latest.png)")
+    args = parser.parse_args()
+
+    width, height = args.size if args.size else (None, None)
+    if args.follow:
+        try:
+            follow(args.infile, args.outfile or "vga_latest.png", width, height)
+        except KeyboardInterrupt:
+            pass
+        return
 
-    infile = sys.argv[1]
-    outfile = sys.argv[2] if len(sys.argv) > 2 else None
+    if args.list:
+        print(f"{len(open_frames(args.infile))} frames")
+        return
 
-    img = load_vga_dump(infile)
+    if args.frame is None:
+        img = load_vga_dump(args.infile, width, height)
+    else:
+        dump = open_frames(args.infile)
+        frames = parse_frames(args.frame, len(dump))
+        if ":" in args.frame:
+            if not args.outfile:
+                parser.error("a frame range needs an output file")
+            frames = frames[::args.step]
+            images = iter_frames(args.infile, frames, width, height, args.scale)
+            ext = os.path.splitext(args.outfile)[1].lower()
+            if ext == ".gif":
+                write_gif(images, args.outfile, 1000 / args.fps)
+            elif ext == ".apng":
+                write_apng(images, args.outfile, len(frames), 1000 / args.fps)
+            else:
+                write_numbered(images, args.outfile)
+                return
+            print(f"Saved {len(frames)} frames to {args.outfile}")
+            return
+        img = load_frame(args.infile, frames[0], width, height, dump)
 
     im = Image.fromarray(img, "RGB")
     im.show()
 
-    if outfile:
-        im.save(outfile)
-        print(f"Saved image to {outfile}")
+    if args.outfile:
+        im.save(args.outfile)
+        print(f"Saved image to {args.outfile}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,238 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+import pack_vob
+import vob_render
+
+# Read packed VOB images (vob_image.hex / vob_image.bin) back, check them,
+# and estimate how much the 12.12 format costs in accuracy.
+#
+# Every stepped quantity is an accumulator that adds a 12.12 increment once
+# per row (or per pixel for the d?dx terms), so the rounding error of an
+# increment is added on every step. With the unrounded source values
+# (vobs.txt) the actual drift at the far corner of each VOB is computed.
+# From the image alone the exact values are unknown: an increment whose low
+# EXACT_BITS bits are zero (0, 1, 0.5, 0.25, ...) is taken as exact, and any
+# other as off by up to half an LSB (2^-13) per step.
+
+LSB = 1.0 / pack_vob.FIX_SCALE
+HEX_LINE = 9                    # "XXXXXXXX\n"
+DEFAULT_DRIFT = 0.5             # Pixels or texels
+EXACT_BITS = 4
+FIX_MAX = 0x7FFFFF
+
+# Stepped value -> (per-row increment, per-pixel increment)
+STEPPED = {"x1": ("dx1dy", None), "x2": ("dx2dy", None), "z": ("dzdy", "dzdx"),
+           "u": ("dudy", "dudx"), "v": ("dvdy", "dvdx")}
+
+hex_digits = np.full(256, 255, dtype=np.uint8)
+hex_digits[np.frombuffer(b"0123456789", np.uint8)] = np.arange(10)
+hex_digits[np.frombuffer(b"ABCDEF", np.uint8)] = np.arange(10, 16)
+hex_digits[np.frombuffer(b"abcdef", np.uint8)] = np.arange(10, 16)
+
+def load_hex(filename):
+    """Decode a hex word image into VOB records.
+
+    A file in write_hex's fixed layout is memory-mapped and decoded with
+    table lookups; anything else (CRLF, comments) is parsed line by line."""
+    size = os.path.getsize(filename)
+    if size and size % HEX_LINE == 0:
+        text = np.memmap(filename, dtype=np.uint8, mode="r").reshape(-1, HEX_LINE)
+        digits = hex_digits[text[:, :8]]
+        if (text[:, 8] == ord("\n")).all() and (digits != 255).all():
+            words = np.zeros(len(text), dtype=np.uint32)
+            for i in range(8):
+                words = (words << 4) | digits[:, i]
+            return words_to_vobs(words, filename)
+    with open(filename) as f:
+        words = np.array([int(line.split("//")[0], 16) for line in f if line.split("//")[0].strip()],
+                         dtype=np.uint32)
+    return words_to_vobs(words, filename)
+
+def words_to_vobs(words, filename):
+    if len(words) % 16:
+        raise ValueError(f"{filename}: {len(words)} words is not a whole number of 16-word VOBs")
+    return words.astype("<u4").view(pack_vob.VOB_DTYPE)
+
+def load_image(filename):
+    """Load a VOB image as a structured array of pack_vob.VOB_DTYPE records.
+
+    A binary image is memory-mapped directly."""
+    if os.path.splitext(filename)[1].lower() == ".hex":
+        return load_hex(filename)
+    size = os.path.getsize(filename)
+    if size % pack_vob.VOB_DTYPE.itemsize:
+        raise ValueError(f"{filename}: {size} bytes is not a whole number of 64-byte VOBs")
+    if size == 0:
+        return np.empty(0, dtype=pack_vob.VOB_DTYPE)
+    return np.memmap(filename, dtype=pack_vob.VOB_DTYPE, mode="r")
+
+def signed16(a):
+    return a - ((a & 0x8000) << 1)
+
+def decode(recs):
+    """Fields of a batch of VOBs as int64 arrays, coordinates signed and 12.12 values raw."""
+    fields = pack_vob.unpack_vobs(recs)
+    for name in vob_render.SIGNED16_FIELDS:
+        fields[name] = signed16(fields[name])
+    return fields
+
+def last_row_edges(f):
+    """x1 and x2 (12.12, not wrapped) on the last row of each VOB. Steps before
+    row brk_y use the old slope, the step on it the average of the old and
+    new slopes, and later ones brk_dxdy."""
+    last = np.maximum(f["yend"] - f["ystart"] - 1, 0)
+    brk = (f["brk_y"] >= f["ystart"]) & (f["brk_y"] < f["yend"] - 1)
+    before = np.where(brk, f["brk_y"] - f["ystart"], last)
+    after = np.maximum(last - before - 1, 0)
+    sel2 = (f["ctrl"] & vob_render.CTRL_BRK_SEL) != 0
+
+    def edge(x, slope, broken):
+        stepped = before * slope + ((slope + f["brk_dxdy"]) >> 1) + after * f["brk_dxdy"]
+        return x + np.where(broken, stepped, last * slope)
+
+    return edge(f["x1"], f["dx1dy"], brk & ~sel2), edge(f["x2"], f["dx2dy"], brk & sel2)
+
+def row_widths(f):
+    """Largest span in pixels, over the first and last rows, that each VOB draws."""
+    x1_end, x2_end = last_row_edges(f)
+    first = (f["x2"] - f["x1"]) >> 12
+    end = (x2_end - x1_end) >> 12
+    return np.maximum(np.maximum(first, end), 0)
+
+def validate(recs, width=640, height=480):
+    """Check a batch of VOBs. Returns a list of (VOB index, message), in VOB order."""
+    f = decode(recs)
+    raw = np.frombuffer(np.ascontiguousarray(recs).tobytes(), dtype=np.uint8).reshape(-1, 64)
+    rows = f["yend"] - f["ystart"]
+    last = np.maximum(rows - 1, 0)
+    checks = [
+        (rows < 0, "yend before ystart"),
+        (f["xclip1"] > f["xclip2"], "xclip1 after xclip2"),
+        ((f["xclip1"] < 0) | (f["xclip2"] > width), f"clip rectangle outside 0..{width}"),
+        ((f["ystart"] < 0) | (f["yend"] > height), f"rows outside 0..{height}"),
+        ((raw[:, 0x1F] != 0) | (raw[:, 0x3F] != 0), "reserved bytes not zero"),
+        ((f["ctrl"] & vob_render.MODE_MASK) > vob_render.MODE_SOLID, "reserved MODE"),
+        ((f["ctrl"] & ~vob_render.CTRL_KNOWN) != 0, "reserved ctrl bits"),
+        ((rows > 0) & (f["x1"] > f["x2"]), "x1 right of x2 on the first row"),
+    ]
+    x1_end, x2_end = last_row_edges(f)
+    # Edges meeting at a vertex may cross by a fraction of a pixel, which only empties the tip row
+    checks.append(((rows > 1) & (x1_end - x2_end >= pack_vob.FIX_SCALE), "edges cross before the last row"))
+    for name, value in (("x1", x1_end), ("x2", x2_end)):
+        checks.append((np.abs(value) > FIX_MAX, f"{name} accumulator overflows"))
+    span = row_widths(f)
+    for name in ("z", "u", "v"):
+        dy, dx = STEPPED[name]
+        corner = np.abs(f[name]) + np.abs(last * f[dy]) + np.abs(span * f[dx])
+        checks.append(((rows > 0) & (corner > FIX_MAX), f"{name} accumulator may overflow"))
+
+    problems = []
+    for mask, message in checks:
+        problems += [(int(i), message) for i in np.nonzero(mask)[0]]
+    return sorted(problems)
+
+def exact_bits(raw):
+    """Fraction bits needed to hold raw 12.12 values exactly (0 for integers)."""
+    raw = np.abs(np.asarray(raw, dtype=np.int64))
+    lowest = np.log2(np.maximum(raw & -raw, 1)).astype(np.int64)     # Position of the lowest set bit
+    return np.where(raw == 0, 0, np.maximum(12 - lowest, 0))
+
+def residuals(f, source, name):
+    """Rounding error of a field per VOB: actual with source, otherwise a bound."""
+    if source is not None:
+        return f[name] * LSB - np.asarray(source[name], dtype=np.float64)
+    return np.where(exact_bits(f[name]) <= 12 - EXACT_BITS, 0.0, 0.5 * LSB)
+
+def drift(recs, source=None):
+    """Accumulated rounding error of each stepped value at the far corner of each
+    VOB, in pixels or texels. Returns {name: per-VOB array}.
+
+    source holds the field arrays the image was packed from (as given to
+    pack_vob.pack_vobs); without it the result is the bound described at
+    the top of this file."""
+    f = decode(recs)
+    rows = np.maximum(f["yend"] - f["ystart"] - 1, 0)
+    span = row_widths(f)
+    result = {}
+    for name, (dy, dx) in STEPPED.items():
+        parts = [residuals(f, source, name), rows * residuals(f, source, dy)]
+        if dx:
+            parts.append(span * residuals(f, source, dx))
+        if source is None:
+            result[name] = sum(np.abs(p) for p in parts)
+        else:
+            result[name] = np.abs(sum(parts))
+    return result
+
+def fraction_bits(steps, limit=DEFAULT_DRIFT):
+    """Fraction bits needed for rounding drift over steps to stay within limit."""
+    return int(np.ceil(np.log2(max((steps + 1) * 0.5 / limit, 1))))
+
+def report(recs, source=None, limit=DEFAULT_DRIFT, show=10):
+    """Print field ranges, drift and the VOBs with the most drift. Returns the number of VOBs over limit.
+
+    The fraction bits for a field are enough to hold its exact increments
+    exactly and to keep the drift of the inexact ones within limit."""
+    f = decode(recs)
+    d = drift(recs, source)
+    rows = np.maximum(f["yend"] - f["ystart"] - 1, 0)
+    span = row_widths(f)
+    kind = "actual" if source is not None else "bound"
+    print(f"{'field':6} {'max |value|':>12} {'int bits':>8} {'max drift':>10} {'frac bits':>9}")
+    for name, (dy, dx) in STEPPED.items():
+        reach = np.abs(f[name] * LSB) + np.abs(rows * f[dy] * LSB)
+        if dx:
+            reach = reach + np.abs(span * f[dx] * LSB)
+        top = float(reach.max()) if len(reach) else 0.0
+        int_bits = int(np.ceil(np.log2(top + 1))) + 1
+        bits = 0
+        for inc, steps in ((dy, rows), (dx, span)):
+            if inc is None or len(recs) == 0:
+                continue
+            inexact = residuals(f, source, inc) != 0
+            if inexact.any():
+                bits = max(bits, fraction_bits(int(steps[inexact].max()), limit))
+            if (~inexact).any():
+                bits = max(bits, int(exact_bits(f[inc][~inexact]).max()))
+        worst = float(d[name].max()) if len(recs) else 0.0
+        print(f"{name:6} {top:12.3f} {int_bits:8} {worst:10.5f} {bits:9}")
+
+    worst = np.max(np.stack(list(d.values())), axis=0) if len(recs) else np.zeros(0)
+    over = np.nonzero(worst > limit)[0]
+    print(f"{len(over)} of {len(recs)} VOBs drift more than {limit} ({kind})")
+    for i in over[np.argsort(-worst[over])][:show]:
+        name = max(d, key=lambda k: d[k][i])
+        print(f"  VOB {i}: {name} drifts {worst[i]:.4f} over {int(rows[i]) + 1} rows, {int(span[i])} pixels wide")
+    return len(over)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode and check a VOB image, and analyse 12.12 drift.")
+    parser.add_argument("image", nargs="?", default="vob_image.hex", help="vob_image.hex or vob_image.bin")
+    parser.add_argument("--source", help="vobs.txt the image was packed from, for actual rather than worst-case drift")
+    parser.add_argument("--size", default="640x480", help="Screen size WxH for range checks")
+    parser.add_argument("--drift", type=float, default=DEFAULT_DRIFT, help="Drift (pixels/texels) to report")
+    parser.add_argument("--show", type=int, default=10, help="Number of problems and worst VOBs to list")
+    args = parser.parse_args()
+
+    recs = load_image(args.image)
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    print(f"{args.image}: {len(recs)} VOBs")
+
+    problems = validate(recs, width, height)
+    for i, message in problems[:args.show]:
+        print(f"  VOB {i}: {message}")
+    if len(problems) > args.show:
+        print(f"  ... {len(problems) - args.show} more")
+    print(f"{len(problems)} problems")
+
+    source = None
+    if args.source:
+        source = pack_vob.vobs_to_fields(pack_vob.parse_vobs(args.source))
+        if len(source["x1"]) != len(recs):
+            print(f"{args.source} has {len(source['x1'])} VOBs, image has {len(recs)}")
+            sys.exit(1)
+    report(recs, source, args.drift, args.show)
+    sys.exit(1 if problems else 0)
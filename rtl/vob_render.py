@@ -0,0 +1,218 @@
+import sys
+import argparse
+import numpy as np
+from PIL import Image
+
+import pack_vob
+
+# Golden model of the VGA2 object pipeline (src/vga2*.sv, src/vga2.md), for
+# VOBs as packed by pack_vob.py. Each VOB covers rows ystart <= y < yend
+# (ystart = 0x7FFF disables it). On each row pixels from int(x1) up to (not
+# including) int(x2) are drawn, clipped to xclip1 <= x < xclip2. z, u and v
+# hold their values at the left edge of the first row. They step by
+# dzdx/dudx/dvdx per pixel from int(x1) and by dzdy/dudy/dvdy per row, as
+# vga2_spanwalk and vga2_object do. The edges step by dx1dy/dx2dy per row.
+# After row brk_y one edge (x1, or x2 if CTRL_BRK_SEL is set) steps by
+# brk_dxdy instead, and the step taken on row brk_y itself is the average of
+# the old and new slopes; a brk_y outside the VOB's rows means no break. All
+# stepping is 12.12 fixed point in 24-bit accumulators.
+#
+# CTRL[2:0] is the mode. As in vga2_pixsrc only bit 0 is decoded: 0 fetches
+# a texel, the byte at src_addr + int(v) * src_stride + int(u) (26-bit
+# address, 16-bit stride, 12-bit int(u)/int(v)), and looks it up in the
+# palette bank CTRL[5:4]; with CTRL_TRANSPARENT set a texel of 0 is not drawn.
+# 1 is a solid fill, the 24-bit RGB colours in src_addr and src_stride
+# interpolated by int(u)[7:0] (0 gives src_addr, 255 src_stride). Every pixel
+# is z tested: int(z) as 12 bits unsigned must be below the z buffer, which
+# starts at 0xFFF, and a drawn pixel writes it.
+#
+# Where the RTL and vga2.md disagree the model picks one side, so a
+# --compare mismatch against simulation may be one of these rather than a
+# model bug:
+#  - MODE polarity follows the RTL. vga2.md has 0 as solid fill and 1 as
+#    bitmap; vga2_pixsrc (and MODE_SOLID here) the other way round.
+#  - The solid fill blend follows vga2.md, int(u) = 0 giving SRC_ADDR.
+#    vga2_pixsrc weights SRC_ADDR by int(u)[7:0] and SRC_STRIDE by the
+#    16-bit complement of it, and keeps only 16 bits of each sum, so its
+#    colours wrap: with both colours equal every nonzero channel comes out
+#    as 0xFF.
+#  - vga2.md puts BRK_SEL at bit 26 of a 32-bit CTRL word; in the object
+#    RAM CTRL is the upper half of the word at 0x08, so it is bit 10 here.
+#    The RTL does not implement the break yet.
+#  - vga2_palette takes transparency and the bank from mode bits 1 and 4:3
+#    rather than CTRL[3] and CTRL[5:4].
+# No test asserts either side yet: testcases/ has no golden images for
+# regress.py --vga. mesh_vob.py builds its VOBs for this model, so its
+# solid fills render as intended here and wrong on the current RTL.
+
+MODE_MASK = 0x0007
+MODE_TEXTURE = 0
+MODE_SOLID = 1
+CTRL_TRANSPARENT = 0x0008
+CTRL_PALETTE = 0x0030           # Palette bank, CTRL[5:4]
+PALETTE_SHIFT = 4
+CTRL_BRK_SEL = 0x0400
+CTRL_KNOWN = MODE_MASK | CTRL_TRANSPARENT | CTRL_PALETTE | CTRL_BRK_SEL
+
+PALETTE_ENTRIES = 1024          # Four banks of 256 (vga2_palette.sv)
+Z_FAR = 0xFFF                   # Z buffer value at the start of each line
+ADDR_MASK = 0x3FFFFFF           # 26-bit texel addresses
+
+SIGNED16_FIELDS = ["ystart", "yend", "xclip1", "xclip2", "brk_y"]
+
+def wrap24(a):
+    """Wrap int64 values to a signed 24-bit accumulator."""
+    return ((a + 0x800000) & 0xFFFFFF) - 0x800000
+
+def load_palette(filename="palette.hex"):
+    """Load palette.hex as vga2_palette does, into a (1024, 3) array; missing entries are black."""
+    palette = np.zeros((PALETTE_ENTRIES, 3), dtype=np.uint8)
+    with open(filename) as f:
+        colors = [int(line, 16) for line in f if line.strip()][:PALETTE_ENTRIES]
+    c = np.array(colors, dtype=np.uint32)
+    palette[:len(c)] = np.stack([c >> 16, c >> 8, c], axis=1).astype(np.uint8)
+    return palette
+
+def split_rgb(color):
+    """(r, g, b) int64 components of 24-bit colours."""
+    return np.stack([(color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF], axis=-1)
+
+class Renderer:
+    """Renders VOBs into an RGB framebuffer, one VOB at a time in order.
+
+    memory is the source memory as a uint8 array indexed by byte address (it
+    wraps around). Without one, texels come from a test pattern int(u) ^ int(v).
+    palette is the (1024, 3) array from load_palette; without one texels are
+    shown as grey levels."""
+
+    def __init__(self, width=640, height=480, memory=None, palette=None):
+        self.width = width
+        self.height = height
+        self.memory = memory
+        if palette is None:
+            palette = np.tile(np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1), (4, 1))
+        self.palette = palette
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+        self.zbuf = np.full((height, width), Z_FAR, dtype=np.int64)
+
+    def spans(self, f):
+        """Row y, left edge x (12.12) and clipped pixel span of every row of one VOB."""
+        rows = np.arange(f["ystart"], f["yend"])
+        if len(rows) == 0:
+            return None
+        slope1 = np.full(len(rows), f["dx1dy"], dtype=np.int64)
+        slope2 = np.full(len(rows), f["dx2dy"], dtype=np.int64)
+        if f["ystart"] <= f["brk_y"] < f["yend"]:
+            slope = slope2 if f["ctrl"] & CTRL_BRK_SEL else slope1
+            old = slope[0]
+            slope[rows > f["brk_y"]] = f["brk_dxdy"]
+            slope[rows == f["brk_y"]] = (old + f["brk_dxdy"]) >> 1
+
+        def walk(start, steps):
+            # Value on each row: the start plus the steps taken on all earlier rows
+            return wrap24(start + np.concatenate([[0], np.cumsum(steps[:-1])]))
+
+        x1 = walk(f["x1"], slope1)
+        x2 = walk(f["x2"], slope2)
+        left = x1 >> 12
+        lo = np.maximum(left, max(f["xclip1"], 0))
+        hi = np.minimum(x2 >> 12, min(f["xclip2"], self.width))
+        keep = (rows >= 0) & (rows < self.height) & (hi > lo)
+        row_index = np.nonzero(keep)[0]
+        return rows[keep], row_index, left[keep], lo[keep], hi[keep]
+
+    def draw(self, f):
+        """Draw one VOB given as a dict of scalar field values (12.12 fields raw)."""
+        spans = self.spans(f)
+        if spans is None or len(spans[0]) == 0:
+            return 0
+        y, r, left, lo, hi = spans
+        n = hi - lo
+        total = int(n.sum())
+        # One entry per pixel: which row it is on and its x
+        row = np.repeat(np.arange(len(y)), n)
+        offsets = np.concatenate([[0], np.cumsum(n)[:-1]])
+        px = lo[row] + (np.arange(total) - offsets[row])
+        k = px - left[row]                      # Pixels from the unclipped left edge
+        step = r[row]                           # Rows from ystart
+
+        def interp(name, dx, dy):
+            # Integer part as the 12 bits vga2_spanwalk hands on
+            return (wrap24(f[name] + step * f[dy] + k * f[dx]) >> 12) & 0xFFF
+
+        z = interp("z", "dzdx", "dzdy")
+        u = interp("u", "dudx", "dudy")
+        py = y[row]
+        visible = z < self.zbuf[py, px]
+        if f["ctrl"] & MODE_SOLID:
+            # RTL mode polarity, vga2.md blend (see the notes at the top)
+            a = (u & 0xFF)[:, None]
+            first, second = split_rgb(f["src_addr"]), split_rgb(f["src_stride"])
+            color = ((first * (255 - a) + second * a) // 255).astype(np.uint8)
+        else:
+            v = interp("v", "dvdx", "dvdy")
+            if self.memory is None:
+                index = (u ^ v) & 0xFF
+            else:
+                addr = ((f["src_addr"] & ADDR_MASK) + v * (f["src_stride"] & 0xFFFF) + u) & ADDR_MASK
+                index = self.memory.take(addr, mode="wrap").astype(np.int64)
+            if f["ctrl"] & CTRL_TRANSPARENT:
+                visible &= index != 0
+            bank = (f["ctrl"] & CTRL_PALETTE) >> PALETTE_SHIFT
+            color = self.palette[bank * 256 + index]
+        py, px, z, color = py[visible], px[visible], z[visible], color[visible]
+        self.zbuf[py, px] = z
+        self.frame[py, px] = color
+        return len(px)
+
+    def render(self, recs):
+        """Draw an array of packed VOB records (pack_vob.VOB_DTYPE). Returns pixels drawn."""
+        fields = pack_vob.unpack_vobs(recs)
+        for name in SIGNED16_FIELDS:
+            fields[name] = fields[name] - ((fields[name] & 0x8000) << 1)
+        drawn = 0
+        for i in range(len(recs)):
+            drawn += self.draw({name: int(a[i]) for name, a in fields.items()})
+        return drawn
+
+def load_memory(filename, base):
+    """Place a binary file at a byte address in an otherwise zero source memory."""
+    data = np.fromfile(filename, dtype=np.uint8)
+    memory = np.zeros(base + len(data), dtype=np.uint8)
+    memory[base:] = data
+    return memory
+
+if __name__ == "__main__":
+    import view_vga_dump
+    import vga_compare
+
+    parser = argparse.ArgumentParser(description="Render VOBs with the blitter golden model.")
+    parser.add_argument("infile", nargs="?", default="vobs.txt", help="VOB description (vobs.txt format) or packed image (.hex/.bin)")
+    parser.add_argument("-o", "--output", default="vob_render.png", help="Rendered image")
+    parser.add_argument("--size", type=view_vga_dump.parse_size, default=(640, 480), help="Framebuffer size WxH")
+    parser.add_argument("--memory", help="Binary file holding texture data (default: a test pattern)")
+    parser.add_argument("--base", type=lambda s: int(s, 0), default=0, help="Byte address of --memory")
+    parser.add_argument("--palette", default="palette.hex")
+    parser.add_argument("--compare", metavar="DUMP", help="Compare the render with a frame of a VGA dump")
+    parser.add_argument("--frame", default="-1", help="Frame of --compare to use (default the last)")
+    args = parser.parse_args()
+
+    if args.infile.lower().endswith((".hex", ".bin")):
+        import vob_decode
+        recs = vob_decode.load_image(args.infile)
+    else:
+        recs = pack_vob.pack_vobs(pack_vob.vobs_to_fields(pack_vob.parse_vobs(args.infile)))
+    memory = load_memory(args.memory, args.base) if args.memory else None
+    renderer = Renderer(*args.size, memory, load_palette(args.palette))
+    drawn = renderer.render(recs)
+    img = renderer.frame
+    Image.fromarray(img, "RGB").save(args.output)
+    print(f"Rendered {len(recs)} VOBs, {drawn} pixels, to {args.output}")
+
+    if args.compare:
+        frames = view_vga_dump.open_frames(args.compare)
+        n = view_vga_dump.parse_frames(args.frame, len(frames))[0]
+        frame = view_vga_dump.load_frame(args.compare, n, *args.size, frames=frames)
+        bad, _ = vga_compare.compare_images(frame, img)
+        print(f"Frame {n}: {int(bad.sum())} pixels differ from the model")
+        sys.exit(1 if bad.any() else 0)